@@ -0,0 +1,112 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""Streaming the files installed by Gentoo binary packages
+
+Both formats are read front to back without unpacking them: a gpkg.tar is
+a plain tar archive with the image as a compressed tar inside of it, an
+xpak .tbz2 is a compressed tar with the xpak metadata appended to it.
+"""
+
+from contextlib import contextmanager
+import io
+import shutil
+import subprocess
+import tarfile
+import threading
+import typing as T
+
+
+# The magic numbers of the compressions tarfile can't read itself, and the
+# commands that decompress them
+_DECOMPRESSORS = {
+    b"\x28\xb5\x2f\xfd": ["zstd", "-dcq"],
+    b"\x04\x22\x4d\x18": ["lz4", "-dcq"],
+}
+
+
+def iter_image(
+    f: T.IO[bytes], gpkg: bool
+) -> T.Iterator[tuple[str, tarfile.TarInfo, T.IO[bytes]]]:
+    """Yield the regular files installed by the binary package in `f`
+
+    Each file is yielded as its path relative to the root it's installed
+    to, its tar member, and a stream of its contents that can only be read
+    until the next file is yielded. `gpkg` tells whether `f` is a gpkg.tar
+    or an xpak package.
+
+    Raises a tarfile.TarError if the package can't be read.
+    """
+    if not gpkg:
+        with _open_tar(f) as image:
+            yield from _iter_files(image, "./")
+        return
+
+    with tarfile.open(fileobj=f, mode="r|") as outer:
+        for member in outer:
+            name = member.name.rsplit("/", 1)[-1]
+            if member.isreg() and name.startswith("image.tar"):
+                if name.endswith(".sig"):
+                    continue
+                image_file = outer.extractfile(member)
+                assert image_file is not None
+                with _open_tar(image_file) as image:
+                    yield from _iter_files(image, "image/")
+                return
+    raise tarfile.ReadError("No image in gpkg")
+
+
+def _iter_files(
+    image: tarfile.TarFile, prefix: str
+) -> T.Iterator[tuple[str, tarfile.TarInfo, T.IO[bytes]]]:
+    for member in image:
+        # Hardlinks are the same file, which was already yielded
+        if not member.isreg():
+            continue
+        path = member.name.removeprefix("./").removeprefix(prefix)
+        file = image.extractfile(member)
+        assert file is not None
+        yield path, member, file
+
+
+@contextmanager
+def _open_tar(f: T.IO[bytes]) -> T.Iterator[tarfile.TarFile]:
+    """Open the compressed tar archive in the stream `f`
+
+    tarfile reads gzip, bzip2 and xz itself, other compressions are piped
+    through their command line tools.
+    """
+    reader = io.BufferedReader(T.cast(io.RawIOBase, f))
+    command = _DECOMPRESSORS.get(reader.peek(4)[:4])
+    if command is None:
+        with tarfile.open(fileobj=reader, mode="r|*") as tar:
+            yield tar
+        return
+
+    try:
+        process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+    except OSError as e:
+        raise tarfile.CompressionError(f"{command[0]} is needed: {e}") from e
+    assert process.stdin is not None and process.stdout is not None
+    feeder = threading.Thread(target=_feed, args=(reader, process.stdin))
+    feeder.start()
+    try:
+        with tarfile.open(fileobj=process.stdout, mode="r|") as tar:
+            yield tar
+    finally:
+        # A package with an xpak trailer makes the command fail once it
+        # got to the end of the tar, and an unfinished read kills it anyway
+        process.kill()
+        process.stdout.close()
+        feeder.join()
+        process.wait()
+
+
+def _feed(reader: T.IO[bytes], pipe: T.IO[bytes]) -> None:
+    try:
+        with pipe:
+            shutil.copyfileobj(reader, pipe)
+    except (BrokenPipeError, ValueError):
+        pass
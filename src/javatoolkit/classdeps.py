@@ -0,0 +1,190 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""Find the entries of a classpath that classes actually use"""
+
+from zipfile import BadZipFile
+from .classpath import Classpath
+from .classresolver import ClassResolver
+from .ziputil import open_archive
+import os
+import re
+import typing as T
+
+
+_MAGIC = b"\xca\xfe\xba\xbe"
+
+_UTF8 = 1
+_CLASS = 7
+# The size of the other constants after their tag
+_CONSTANT_SIZES = {
+    3: 4,  # Integer
+    4: 4,  # Float
+    5: 8,  # Long
+    6: 8,  # Double
+    8: 2,  # String
+    9: 4,  # Fieldref
+    10: 4,  # Methodref
+    11: 4,  # InterfaceMethodref
+    12: 4,  # NameAndType
+    15: 3,  # MethodHandle
+    16: 2,  # MethodType
+    17: 4,  # Dynamic
+    18: 4,  # InvokeDynamic
+    19: 2,  # Module
+    20: 2,  # Package
+}
+# Long and Double take two entries of the constant pool
+_WIDE = (5, 6)
+
+# A class in a descriptor or a generic signature, like Ljava/lang/String;
+_DESCRIPTOR_CLASS = re.compile(rb"L([^;<>.\[\]()]+)[;<]")
+
+
+def class_references(data: bytes) -> set[str]:
+    """The internal names (like java/lang/String) of the classes the class
+    file `data` refers to
+
+    Only the constant pool is read. Next to the CONSTANT_Class entries, the
+    classes in the descriptors and signatures in it count too, since the
+    compiler needs the classes in the signatures of the methods a class
+    calls. Raises a ValueError if `data` isn't a class file.
+    """
+    if not data.startswith(_MAGIC) or len(data) < 10:
+        raise ValueError("Not a class file")
+    count = data[8] << 8 | data[9]
+    # Index of each Utf8 constant -> where its bytes start
+    utf8: dict[int, int] = {}
+    class_names: list[int] = []
+    sizes = _CONSTANT_SIZES
+    pos = 10
+    index = 1
+    try:
+        while index < count:
+            tag = data[pos]
+            if tag == _UTF8:
+                utf8[index] = pos + 3
+                pos += 3 + (data[pos + 1] << 8 | data[pos + 2])
+            elif tag == _CLASS:
+                class_names.append(data[pos + 1] << 8 | data[pos + 2])
+                pos += 3
+            else:
+                pos += 1 + sizes[tag]
+                if tag in _WIDE:
+                    index += 1
+            index += 1
+    except (IndexError, KeyError):
+        raise ValueError("Bad constant pool") from None
+    if pos > len(data):
+        raise ValueError("Bad constant pool")
+
+    def value(start: int) -> bytes:
+        return data[start : start + (data[start - 2] << 8 | data[start - 1])]
+
+    names: set[bytes] = set()
+    for name_index in class_names:
+        start = utf8.get(name_index)
+        name = value(start) if start is not None else b""
+        if name.startswith(b"["):
+            # An array, only its element type can be a class
+            names.update(_DESCRIPTOR_CLASS.findall(name))
+        elif name:
+            names.add(name)
+    for start in utf8.values():
+        # Descriptors and signatures start like this
+        if data[start : start + 1] in (b"(", b"<", b"L"):
+            names.update(_DESCRIPTOR_CLASS.findall(value(start)))
+    return {name.decode("utf-8", errors="replace") for name in names}
+
+
+def read_classes(path: str) -> T.Iterator[bytes]:
+    """The class files in the jar or directory at `path`"""
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for file in files:
+                if file.endswith(".class"):
+                    with open(os.path.join(root, file), "rb") as f:
+                        yield f.read()
+        return
+    try:
+        with open_archive(path) as jar:
+            for i in range(len(jar)):
+                if jar.endswith(i, b".class"):
+                    yield jar.read(i)
+    except (OSError, BadZipFile):
+        return
+
+
+class ClasspathMinimizer:
+    """Find the entries of a classpath that some root classes need
+
+    Starting from the roots, the classes they refer to are looked up on
+    the classpath, then the classes those refer to and so on. An entry is
+    needed if any of these classes comes from it. Classes that aren't on
+    the classpath, like those of the JDK, end the search.
+
+    The references of each class are kept per entry, so several minimize()
+    calls over the same classpath, like for each package of a build, only
+    read each class once.
+    """
+
+    def __init__(
+        self, classpath: Classpath | T.Iterable[str], max_open: int = 64
+    ) -> None:
+        self.resolver = ClassResolver(classpath, max_open)
+        # Entry -> class name -> the classes it refers to
+        self.__references: dict[str, dict[str, set[str]]] = {}
+
+    def __enter__(self) -> "ClasspathMinimizer":
+        return self
+
+    def __exit__(self, *exc_info: T.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.resolver.close()
+
+    def minimize(
+        self, classes: T.Iterable[str] = (), roots: T.Iterable[str] = ()
+    ) -> Classpath:
+        """The entries of the classpath that `classes`, like a.b.C, and the
+        classes in the jars or directories `roots` need, in their order on
+        the classpath. Roots that are on the classpath are kept."""
+        todo = [name.replace(".", "/") for name in classes]
+        needed = set()
+        entries = {os.path.normpath(entry): entry for entry in self.resolver.entries}
+        for root in roots:
+            entry = entries.get(os.path.normpath(root))
+            if entry is not None:
+                needed.add(entry)
+            for data in read_classes(root):
+                try:
+                    todo += class_references(data)
+                except ValueError:
+                    continue
+
+        seen: set[str] = set()
+        while todo:
+            name = todo.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            entry = self.resolver.find(name + ".class")
+            if entry is None:
+                continue
+            needed.add(entry)
+            todo += self.__references_of(entry, name)
+
+        result = Classpath()
+        result.classpath = [e for e in self.resolver.entries if e in needed]
+        return result
+
+    def __references_of(self, entry: str, name: str) -> set[str]:
+        references = self.__references.setdefault(entry, {})
+        if name not in references:
+            data = self.resolver.read(name + ".class")
+            try:
+                references[name] = class_references(data or b"")
+            except ValueError:
+                references[name] = set()
+        return references[name]
@@ -0,0 +1,346 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""A persistent index of the members of the installed jars, for findclass"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from zipfile import BadZipFile
+from .ziputil import open_archive
+import functools
+import os
+import re
+import sqlite3
+import typing as T
+
+
+def index_path() -> str:
+    """Where findclass keeps its index, $FINDCLASS_INDEX or a file in the
+    cache dir of the user"""
+    path = os.environ.get("FINDCLASS_INDEX")
+    if path:
+        return path
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return f"{cache_dir}/javatoolkit/findclass.db"
+
+
+class ClassIndex:
+    """Index the member names of jars in the sqlite database at `path`
+
+    refresh() only reads the jars whose (device, inode, size, mtime_ns)
+    changed since they were indexed. Names are kept sorted both as they are
+    and reversed, and every jar has the set of three character sequences
+    (trigrams) found in its names. Lookups narrow the names down through
+    these before any regular expression is run, so finding a class doesn't
+    depend on the number of jars.
+    """
+
+    # Bumped when the tables change, an index with another version is
+    # dropped and built again
+    __schema_version = 2
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.__db = sqlite3.connect(path, timeout=60)
+        self.__db.create_function("regexp", 2, _regexp, deterministic=True)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA foreign_keys=ON")
+        (version,) = self.__db.execute("PRAGMA user_version").fetchone()
+        if version != self.__schema_version:
+            self.__db.executescript(
+                """DROP TABLE IF EXISTS trigrams;
+                DROP TABLE IF EXISTS members;
+                DROP TABLE IF EXISTS jars;"""
+            )
+        self.__db.executescript(
+            f"""CREATE TABLE IF NOT EXISTS jars (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                package TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS members (
+                name TEXT NOT NULL,
+                reversed TEXT NOT NULL,
+                jar INTEGER NOT NULL REFERENCES jars (id) ON DELETE CASCADE
+            );
+            CREATE INDEX IF NOT EXISTS members_name ON members (name);
+            CREATE INDEX IF NOT EXISTS members_reversed ON members (reversed);
+            CREATE INDEX IF NOT EXISTS members_jar ON members (jar);
+            CREATE TABLE IF NOT EXISTS trigrams (
+                trigram TEXT NOT NULL,
+                jar INTEGER NOT NULL REFERENCES jars (id) ON DELETE CASCADE,
+                PRIMARY KEY (trigram, jar)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS trigrams_jar ON trigrams (jar);
+            PRAGMA user_version = {self.__schema_version};"""
+        )
+        self.__db.commit()
+
+    def __enter__(self) -> "ClassIndex":
+        return self
+
+    def __exit__(self, *exc_info: T.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__db.close()
+
+    def refresh(
+        self, jars: T.Iterable[tuple[str, str]], rebuild: bool = False, jobs: int = 1
+    ) -> tuple[int, int]:
+        """Bring the index up to date with the (package, jar path) pairs in
+        `jars`, which are all the jars that should be in it
+
+        Jars that changed are read again, those that are gone are dropped.
+        With `rebuild` every jar is read again. The jars are read on `jobs`
+        threads, and each is written in a transaction of its own, so that
+        others can use the index while it is built. Returns how many jars
+        were read and how many were dropped.
+        """
+        known = {
+            path: (jar_id, (package, position), tuple(identity))
+            for jar_id, path, package, position, *identity in self.__db.execute(
+                "SELECT id, path, package, position, dev, ino, size, mtime_ns"
+                " FROM jars"
+            )
+        }
+        if rebuild:
+            with self.__db:
+                self.__db.execute("DELETE FROM jars")
+            known = {}
+
+        # (package, position, path, identity, id of its old row) of each jar
+        # that has to be read
+        changed = []
+        moved = []
+        seen: set[str] = set()
+        for position, (package, path) in enumerate(jars):
+            if path in seen:
+                continue
+            seen.add(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+            jar_id, old_place, old_identity = known.get(path, (None, None, None))
+            if old_identity != identity:
+                changed.append((package, position, path, identity, jar_id))
+            elif old_place != (package, position):
+                # Most jars stay where they were, only write those that moved
+                moved.append((package, position, jar_id))
+
+        with self.__db:
+            self.__db.executemany(
+                "UPDATE jars SET package = ?, position = ? WHERE id = ?", moved
+            )
+        with ThreadPoolExecutor(max(jobs, 1)) as pool:
+            all_names = pool.map(self.__read_names, [jar[2] for jar in changed])
+            for (package, position, path, identity, jar_id), names in zip(
+                changed, all_names
+            ):
+                with self.__db:
+                    if jar_id is not None:
+                        self.__db.execute("DELETE FROM jars WHERE id = ?", (jar_id,))
+                    cursor = self.__db.execute(
+                        "INSERT INTO jars VALUES (NULL, ?, ?, ?, ?, ?, ?, ?)",
+                        (path, package, position, *identity),
+                    )
+                    self.__db.executemany(
+                        "INSERT INTO members VALUES (?, ?, ?)",
+                        ((name, name[::-1], cursor.lastrowid) for name in names),
+                    )
+                    self.__db.executemany(
+                        "INSERT INTO trigrams VALUES (?, ?)",
+                        ((t, cursor.lastrowid) for t in _trigrams(names)),
+                    )
+
+        gone = [(jar_id,) for path, (jar_id, _, _) in known.items() if path not in seen]
+        with self.__db:
+            self.__db.executemany("DELETE FROM jars WHERE id = ?", gone)
+        return len(changed), len(gone)
+
+    def lookup(self, pattern: str) -> list[tuple[str, str]]:
+        """The (package, jar path) of every jar with a member that matches
+        `pattern`, in the order they were given to refresh()
+
+        `pattern` is a regular expression that is searched for anywhere in
+        the member names, like findclass does without the index, and a plain
+        name like org/foo/Bar is just one without special characters. It only
+        runs on the names that start or end with its literal text, if it is
+        anchored there, or else on those of the jars that have all the
+        trigrams of its literal text. It runs on every name only if there is
+        no such text. Plain names are planned as that text right away and
+        then searched for with instr() instead of the regular expression.
+        """
+        if _SPECIAL_CHARS.search(pattern) is None:
+            plan = _Plan(runs=[pattern])
+            match = "instr(members.name, ?) > 0"
+        else:
+            # Without literal text it has to run on every name
+            plan = _plan(pattern) or _Plan()
+            match = "members.name REGEXP ?"
+        trigrams = _trigrams(plan.runs)
+        if len(plan.prefix) >= max(len(plan.suffix), 1) and (
+            len(plan.prefix) >= 3 or not trigrams
+        ):
+            condition = "members.name >= ? AND members.name < ?"
+            parameters: list[str | int] = [plan.prefix, plan.prefix + _MAX_CHAR]
+        elif len(plan.suffix) >= 3 or (plan.suffix and not trigrams):
+            condition = "members.reversed >= ? AND members.reversed < ?"
+            parameters = [plan.suffix[::-1], plan.suffix[::-1] + _MAX_CHAR]
+        elif trigrams:
+            placeholders = ", ".join("?" * len(trigrams))
+            condition = f"""members.jar IN (
+                SELECT jar FROM trigrams WHERE trigram IN ({placeholders})
+                GROUP BY jar HAVING count(*) = ?
+            )"""
+            parameters = [*trigrams, len(trigrams)]
+        else:
+            condition = "1"
+            parameters = []
+        return self.__jars_where(f"({condition}) AND {match}", [*parameters, pattern])
+
+    def __jars_where(
+        self, condition: str, parameters: T.Sequence[str | int]
+    ) -> list[tuple[str, str]]:
+        return self.__db.execute(
+            f"""SELECT jars.package, jars.path FROM jars WHERE jars.id IN (
+                SELECT members.jar FROM members WHERE {condition}
+            ) ORDER BY jars.position""",
+            parameters,
+        ).fetchall()
+
+    @staticmethod
+    def __read_names(path: str) -> list[str]:
+        try:
+            with open_archive(path) as jar:
+                return [jar.name(i) for i in range(len(jar))]
+        except (OSError, BadZipFile):
+            return []
+
+
+@functools.lru_cache(maxsize=16)
+def _compile(pattern: str) -> re.Pattern[str]:
+    return re.compile(pattern)
+
+
+def _regexp(pattern: str, name: str) -> bool:
+    return _compile(pattern).search(name) is not None
+
+
+# Sorts after every other character, name >= p AND name < p + _MAX_CHAR
+# are the names that start with p
+_MAX_CHAR = "\U0010ffff"
+
+# The characters that make a pattern more than a plain name
+_SPECIAL_CHARS = re.compile(r"[.\\^$*+?{}\[\]|()]")
+
+
+def _trigrams(texts: T.Iterable[str]) -> set[str]:
+    return {text[i : i + 3] for text in texts for i in range(len(text) - 2)}
+
+
+@dataclass
+class _Plan:
+    """The literal text of a regular expression"""
+
+    # What every name it matches starts with, if it is anchored with a ^
+    prefix: str = ""
+    # What every name it matches ends with, if it is anchored with a $
+    suffix: str = ""
+    # Text every name it matches has somewhere
+    runs: list[str] = field(default_factory=list)
+
+
+def _plan(pattern: str) -> _Plan | None:
+    """The literal text of `pattern`, or None if it has alternatives or
+    flags that make it hard to tell"""
+    plan = _Plan()
+    at_start = pattern.startswith("^")
+    run = ""
+    i = 1 if at_start else 0
+    while i < len(pattern):
+        c = pattern[i]
+        literal = None
+        if c == "|" or pattern.startswith(("(?i", "(?a", "(?L", "(?x"), i):
+            return None
+        if c == "\\":
+            # \w, \d, \b and the like aren't literal text
+            if not pattern[i + 1 : i + 2].isalnum():
+                literal = pattern[i + 1 : i + 2]
+            i += 2
+        elif c == "[":
+            i = _skip_class(pattern, i)
+        elif c == "(":
+            i = _skip_group(pattern, i)
+        elif c == "$" and i == len(pattern) - 1:
+            plan.suffix = run
+            i += 1
+        elif c in ".^$":
+            i += 1
+        else:
+            literal = c
+            i += 1
+
+        optional = repeated = False
+        quantifier = re.match(r"[*?+]|\{(\d*)(?:,\d*)?\}", pattern[i:])
+        if quantifier is not None:
+            optional = quantifier[0] in "*?" or quantifier[1] in ("", "0")
+            repeated = True
+            i += quantifier.end()
+            # Lazy or possessive
+            if pattern[i : i + 1] in ("?", "+"):
+                i += 1
+
+        if literal is not None and not optional:
+            run += literal
+        if literal is None or optional or repeated:
+            if at_start:
+                plan.prefix = run
+                at_start = False
+            plan.runs.append(run)
+            run = ""
+    if at_start:
+        plan.prefix = run
+    plan.runs.append(run)
+    return plan
+
+
+def _skip_class(pattern: str, i: int) -> int:
+    """The index after the character class starting at `i`"""
+    i += 1
+    if pattern.startswith("^", i):
+        i += 1
+    # A ] right at the start is part of the class
+    if pattern.startswith("]", i):
+        i += 1
+    while i < len(pattern) and pattern[i] != "]":
+        i += 2 if pattern[i] == "\\" else 1
+    return i + 1
+
+
+def _skip_group(pattern: str, i: int) -> int:
+    """The index after the group starting at `i`"""
+    depth = 0
+    while i < len(pattern):
+        match pattern[i]:
+            case "\\":
+                i += 2
+                continue
+            case "[":
+                i = _skip_class(pattern, i)
+                continue
+            case "(":
+                depth += 1
+            case ")":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        i += 1
+    return i
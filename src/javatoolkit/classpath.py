@@ -3,6 +3,19 @@
 #
 # Licensed under the GNU General Public License, v2
 
+import os
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+ClasspathProblem = namedtuple("ClasspathProblem", ["entry", "kind", "detail"])
+ClasspathProblem.__doc__ = """Something wrong with an entry of a classpath. kind is
+"missing", "unreadable", "not a zip" or "duplicate"."""
+
+# Absolute path of an entry -> ((device, inode) or None, kind, detail) of
+# when it was checked, so that each path is only checked once per process
+_checked_entries = {}
+
 
 class ClasspathIter:
     """An iterator for the Classpath class, below."""
@@ -51,3 +64,51 @@ class Classpath:
     def append(self, element):
         """Appends an path to the classpath."""
         self.classpath.append(element)
+
+    def validate(self, jobs=8):
+        """Returns a list of ClasspathProblem for the entries that are
+        missing, unreadable, not zip archives or the same file as an earlier
+        entry. The entries are checked on `jobs` threads, and each path only
+        once per process."""
+        entries = [e for e in self.classpath if e]
+        with ThreadPoolExecutor(max(jobs, 1)) as pool:
+            results = list(pool.map(_check_entry, entries))
+
+        problems = []
+        first_entries = {}
+        for i, (entry, (identity, kind, detail)) in enumerate(zip(entries, results)):
+            if kind is not None:
+                problems.append(ClasspathProblem(entry, kind, detail))
+                continue
+            first = first_entries.setdefault(identity, i)
+            if first != i:
+                problems.append(ClasspathProblem(entry, "duplicate", entries[first]))
+        return problems
+
+
+def _check_entry(entry):
+    path = os.path.abspath(entry)
+    result = _checked_entries.get(path)
+    if result is None:
+        result = _checked_entries[path] = _check_path(path)
+    return result
+
+
+def _check_path(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None, "missing", None
+    except OSError as e:
+        return None, "unreadable", e.strerror
+    identity = (st.st_dev, st.st_ino)
+    try:
+        if os.path.isdir(path):
+            os.listdir(path)
+            return identity, None, None
+        with open(path, "rb") as f:
+            if not zipfile.is_zipfile(f):
+                return identity, "not a zip", None
+    except OSError as e:
+        return identity, "unreadable", e.strerror
+    return identity, None, None
@@ -0,0 +1,106 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""Find which entry of a classpath provides a class"""
+
+from collections import OrderedDict
+from zipfile import BadZipFile, ZipFile
+from .classpath import Classpath
+from .ziputil import open_archive
+import os
+import typing as T
+
+
+class ClassResolver:
+    """Look up the members of the jars and directories of a classpath
+
+    The entries are only indexed when a lookup needs them: a name is
+    looked for in the merged index of the entries read so far, and only
+    if it isn't there are the next entries read, one at a time, until one
+    has it. Once every entry is indexed, a lookup is a single dict lookup.
+    Only the central directory of a jar is read to index it.
+
+    Members are read through ZipFiles that are kept open for the next
+    reads, up to `max_open` of them, the least recently used are closed.
+    """
+
+    def __init__(
+        self, classpath: Classpath | T.Iterable[str], max_open: int = 64
+    ) -> None:
+        if isinstance(classpath, Classpath):
+            classpath = classpath.classpath
+        self.entries = [entry for entry in classpath if entry]
+        self.max_open = max_open
+        # Name -> index of the first entry that has it
+        self.__names: dict[str, int] = {}
+        self.__indexed = 0
+        self.__open: OrderedDict[int, ZipFile] = OrderedDict()
+
+    def __enter__(self) -> "ClassResolver":
+        return self
+
+    def __exit__(self, *exc_info: T.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the jars that are kept open"""
+        for jar in self.__open.values():
+            jar.close()
+        self.__open.clear()
+
+    def find(self, name: str) -> str | None:
+        """The first entry with the member `name`, like a/b/C.class, or None
+        if no entry has it"""
+        index = self.__find(name)
+        return None if index is None else self.entries[index]
+
+    def find_class(self, class_name: str) -> str | None:
+        """The first entry with the class `class_name`, like a.b.C"""
+        return self.find(class_name.replace(".", "/") + ".class")
+
+    def read(self, name: str) -> bytes | None:
+        """The member `name` of the first entry that has it, or None if no
+        entry has it"""
+        index = self.__find(name)
+        if index is None:
+            return None
+        entry = self.entries[index]
+        if os.path.isdir(entry):
+            with open(os.path.join(entry, name), "rb") as f:
+                return f.read()
+        return self.__jar(index).read(name)
+
+    def __find(self, name: str) -> int | None:
+        index = self.__names.get(name)
+        while index is None and self.__indexed < len(self.entries):
+            self.__index(self.__indexed)
+            self.__indexed += 1
+            index = self.__names.get(name)
+        return index
+
+    def __index(self, index: int) -> None:
+        entry = self.entries[index]
+        if os.path.isdir(entry):
+            names: T.Iterable[str] = (
+                os.path.relpath(os.path.join(root, file), entry)
+                for root, _, files in os.walk(entry)
+                for file in files
+            )
+        else:
+            try:
+                with open_archive(entry) as jar:
+                    names = [jar.name(i) for i in range(len(jar))]
+            except (OSError, BadZipFile):
+                return
+        for name in names:
+            self.__names.setdefault(name, index)
+
+    def __jar(self, index: int) -> ZipFile:
+        jar = self.__open.get(index)
+        if jar is not None:
+            self.__open.move_to_end(index)
+            return jar
+        jar = self.__open[index] = ZipFile(self.entries[index])
+        while len(self.__open) > self.max_open:
+            self.__open.popitem(last=False)[1].close()
+        return jar
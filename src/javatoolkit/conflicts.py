@@ -0,0 +1,113 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""Classes and packages that are in more than one jar, for findclass"""
+
+from dataclasses import dataclass
+from zipfile import BadZipFile
+from .ziputil import open_archive
+import hashlib
+import typing as T
+
+
+@dataclass
+class Conflict:
+    """A class or package that is in several jars"""
+
+    # "duplicate" for a class that is the same in all the jars, "conflict"
+    # for one that differs and "split" for a package
+    kind: str
+    # With dots, like org.foo.Bar or org.foo
+    name: str
+    jars: list[str]
+
+
+def read_classes(path: str) -> list[tuple[str, int]] | None:
+    """The name and CRC32 of every class in the jar at `path`, or None if
+    it can't be read
+
+    Only the central directory is read. module-info.class and the classes
+    below META-INF/, like those of the later versions of a multi-release
+    jar, are left out.
+    """
+    try:
+        with open_archive(path) as jar:
+            return [
+                (jar.name(i), jar.crc(i))
+                for i in range(len(jar))
+                if jar.endswith(i, b".class")
+                and not jar.endswith(i, b"module-info.class")
+                and not jar.name(i).startswith("META-INF/")
+            ]
+    except (OSError, BadZipFile):
+        return None
+
+
+class ConflictFinder:
+    """Find the classes and packages that are in more than one of the jars
+    given to add_jar()
+
+    Classes are told apart by the CRC32 of their member, so a class that is
+    in several jars is a duplicate if its bytes are the same in all of
+    them and a conflict otherwise. A package is split if it is in several
+    jars with different classes, the jars with a byte identical copy of it
+    don't count.
+
+    The jars go through one at a time. For each class only the first jar
+    and CRC are kept, and for each package a digest per jar, so the memory
+    needed grows with the number of distinct classes but not with the
+    number of jars they are repeated in.
+    """
+
+    def __init__(self) -> None:
+        self.jars: list[str] = []
+        # Class name -> jar index << 32 | CRC32, of the first jar it is in
+        self.__first: dict[str, int] = {}
+        # Class name -> the same for each of the other jars it is in
+        self.__repeated: dict[str, list[int]] = {}
+        # Package -> jar index -> digest of its classes in that jar
+        self.__packages: dict[str, dict[int, bytes]] = {}
+
+    def add_jar(self, path: str, classes: T.Iterable[tuple[str, int]]) -> None:
+        """Add the jar at `path` with its (name, CRC32) `classes`"""
+        jar = len(self.jars)
+        self.jars.append(path)
+        packages: dict[str, list[tuple[str, int]]] = {}
+        for name, crc in classes:
+            entry = jar << 32 | crc
+            first = self.__first.setdefault(name, entry)
+            if first != entry and first >> 32 != jar:
+                self.__repeated.setdefault(name, []).append(entry)
+            packages.setdefault(name.rpartition("/")[0], []).append((name, crc))
+
+        for package, members in packages.items():
+            digest = hashlib.blake2b(digest_size=16)
+            for name, crc in sorted(members):
+                digest.update(f"{name}\0{crc}\0".encode())
+            self.__packages.setdefault(package, {})[jar] = digest.digest()
+
+    def conflicts(self) -> list[Conflict]:
+        """The classes in more than one jar and the split packages, sorted
+        by name"""
+        found = []
+        for name, entries in self.__repeated.items():
+            entries = [self.__first[name], *entries]
+            crcs = {entry & 0xFFFFFFFF for entry in entries}
+            found.append(
+                Conflict(
+                    "duplicate" if len(crcs) == 1 else "conflict",
+                    name.removesuffix(".class").replace("/", "."),
+                    [self.jars[entry >> 32] for entry in entries],
+                )
+            )
+        for package, digests in self.__packages.items():
+            # Classes without a package aren't in a package to split
+            if package and len(set(digests.values())) > 1:
+                found.append(
+                    Conflict(
+                        "split",
+                        package.replace("/", "."),
+                        [self.jars[jar] for jar in digests],
+                    )
+                )
+        return sorted(found, key=lambda c: (c.name, c.kind))
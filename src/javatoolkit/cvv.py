@@ -2,38 +2,158 @@
 # Copyright 1999-2008 Gentoo Foundation
 # Distributed under the terms of the GNU General Public License v2
 
-from dataclasses import dataclass
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
 from struct import unpack
-from zipfile import ZipFile
+from zipfile import BadZipFile, ZipFile
+from .binpkg import iter_image
+from .ziputil import (
+    ArchiveDirectory,
+    CentralDirectory,
+    ZipDirectory,
+    open_archive,
+    open_jmod,
+    open_stream_archive,
+)
 import os
+import random
 import re
+import stat
 import typing as T
 
+if T.TYPE_CHECKING:
+    from .daemon import DaemonClient
+    from .histogram import VersionHistogram
+    from .scancache import ScanCache
+    from .targetpolicy import TargetPolicy
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class FileLoc:
     path: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class JarLoc:
-    """A file inside a jar archive"""
+    """A file inside a jar archive, which may itself be inside an archive"""
 
-    jar: FileLoc
+    jar: "FileLoc | JarLoc"
     member: str
 
+    @property
+    def file(self) -> FileLoc:
+        """The file on disk that the archives are in"""
+        jar = self.jar
+        while isinstance(jar, JarLoc):
+            jar = jar.jar
+        return jar
+
 
 Loc = FileLoc | JarLoc
 
 
-@dataclass
+def format_version(version: int) -> str:
+    return f"1.{version}" if version < 9 else f"{version}"
+
+
+def parse_version(version: str) -> int:
+    # this is a number 8 9 10 11 etc, not including 1.
+    return int(version.split(".")[-1])
+
+
+@dataclass(slots=True, init=False)
 class ClassFile:
+    """A checked class, with its version and the one it was checked against
+
+    The versions are kept as numbers and only formatted when asked for, but
+    can be given either way.
+    """
+
     loc: Loc
-    encoded_version: str
-    expected_version: str
+    version: int
+    target_version: int
+
+    __match_args__ = ("loc", "encoded_version", "expected_version")
 
+    def __init__(
+        self, loc: Loc, encoded_version: int | str, expected_version: int | str
+    ) -> None:
+        self.loc = loc
+        self.version = (
+            encoded_version
+            if isinstance(encoded_version, int)
+            else parse_version(encoded_version)
+        )
+        self.target_version = (
+            expected_version
+            if isinstance(expected_version, int)
+            else parse_version(expected_version)
+        )
+
+    @property
+    def encoded_version(self) -> str:
+        return format_version(self.version)
+
+    @property
+    def expected_version(self) -> str:
+        return format_version(self.target_version)
+
+
+class ClassFileColumns(T.Sequence[ClassFile]):
+    """A list of ClassFiles that is stored column by column
+
+    Only the member name of each class is kept as an object of its own, the
+    archive it's in is stored once and the versions go into arrays. The
+    ClassFiles are created again when they're accessed.
+    """
+
+    def __init__(self) -> None:
+        # The archives, or None for loose class files
+        self.__jars: list[FileLoc | JarLoc | None] = []
+        self.__jar_indices: dict[FileLoc | JarLoc | None, int] = {}
+        self.__jar = array("L")
+        self.__members: list[str] = []
+        self.__versions = array("h")
+        self.__target_versions = array("h")
+
+    def append(self, cf: ClassFile) -> None:
+        match cf.loc:
+            case FileLoc(path):
+                jar, member = None, path
+            case JarLoc(jar, member):
+                pass
+        if (index := self.__jar_indices.get(jar)) is None:
+            index = self.__jar_indices[jar] = len(self.__jars)
+            self.__jars.append(jar)
+        self.__jar.append(index)
+        self.__members.append(member)
+        self.__versions.append(cf.version)
+        self.__target_versions.append(cf.target_version)
+
+    def __len__(self) -> int:
+        return len(self.__members)
+
+    @T.overload
+    def __getitem__(self, index: int) -> ClassFile: ...
+
+    @T.overload
+    def __getitem__(self, index: slice) -> list[ClassFile]: ...
+
+    def __getitem__(self, index: int | slice) -> ClassFile | list[ClassFile]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        jar = self.__jars[self.__jar[index]]
+        member = self.__members[index]
+        return ClassFile(
+            FileLoc(member) if jar is None else JarLoc(jar, member),
+            self.__versions[index],
+            self.__target_versions[index],
+        )
 
-@dataclass
+
+@dataclass(slots=True)
 class BadMultireleaseManifest:
     """A multi-release jar but without `Multi-Release: true` in MANIFEST.MF"""
 
@@ -41,49 +161,165 @@ class BadMultireleaseManifest:
     multiReleaseDirs: list[JarLoc]
 
 
-@dataclass
+@dataclass(slots=True)
 class SkippedVersionDir:
     loc: JarLoc
     reason: str
 
 
-@dataclass
+@dataclass(slots=True)
 class SkippedModuleInfo:
     loc: Loc
     reason: str = "A module-info requires java release >= 9"
 
 
+@dataclass(slots=True)
+class SkippedNestedArchive:
+    """An archive inside of an archive that couldn't be read"""
+
+    loc: JarLoc
+    reason: str
+
+
 GoodFile = ClassFile
 BadFile = ClassFile | BadMultireleaseManifest
-SkippedFile = SkippedVersionDir | SkippedModuleInfo
+SkippedFile = SkippedVersionDir | SkippedModuleInfo | SkippedNestedArchive
+Result = (
+    tuple[T.Literal["good"], GoodFile]
+    | tuple[T.Literal["bad"], BadFile]
+    | tuple[T.Literal["skipped"], SkippedFile]
+)
+
+
+@dataclass(slots=True)
+class JarScan:
+    """What was read from a jar, independent of the target version
+
+    This is enough to check the jar again without opening it.
+    """
+
+    is_multirelease: bool
+    # The (path, version) of every class member. The version is None for
+    # classes that never get checked, like those in ignored version dirs.
+    classes: list[tuple[str, int | None]]
+    # The (path, scan) of every archive inside of this one, or (path, reason)
+    # if it couldn't be read
+    nested: list[tuple[str, "JarScan | str"]] = field(default_factory=list)
+    # See ArchiveDirectory.digest(), only set when it was asked for
+    digest: bytes | None = None
+    # How many classes were left out of `classes` by sampling
+    unsampled: int = 0
+
+    def to_json(self) -> list[T.Any]:
+        """The scan as plain data, without its digest"""
+        nested = [
+            [path, n if isinstance(n, str) else n.to_json()] for path, n in self.nested
+        ]
+        return [self.is_multirelease, self.classes, nested]
+
+    @classmethod
+    def from_json(cls, data: list[T.Any]) -> "JarScan":
+        is_multirelease, classes, nested = data
+        return cls(
+            is_multirelease,
+            [(path, version) for path, version in classes],
+            [
+                (path, n if isinstance(n, str) else cls.from_json(n))
+                for path, n in nested
+            ],
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class _WorkUnit:
+    """A file, or a range of a big jar's members, read by one worker process"""
+
+    path: str
+    # (start, stop) indices of the jar's members, None for the whole file
+    members: tuple[int, int] | None = None
+    # See CVVMagic.read_jar()
+    sample: int = 0
 
 
 class CVVMagic:
-    def __init__(self, target: str) -> None:
-        # this is a number 8 9 10 11 etc, not including 1.
-        if "." in target:
-            self.target = int(target.split(".")[-1])
-        else:
-            self.target = int(target)
-        self.good: list[GoodFile] = []
+    # Jars at least this big are split into several work units by do_many()
+    split_size = 16 * 1024 * 1024
+    # How many jar members go into one work unit of a split jar
+    split_members = 4096
+    # How many loose class files are read by a single task of do_many()
+    class_batch = 64
+    # The archives that are checked, also when they're inside other archives
+    archive_suffixes = (".jar", ".war", ".ear")
+    # Gentoo binary packages, whose images are checked like an archive
+    binpkg_suffixes = (".gpkg.tar", ".tbz2")
+    # JDK modules, whose classes are checked like those of a jar
+    jmod_suffixes = (".jmod",)
+    # Where the classes of a JDK module are
+    jmod_classes = "classes/"
+    # How deep archives inside of archives are followed
+    max_nesting = 8
+
+    def __init__(
+        self,
+        target: str,
+        cache: T.Optional["ScanCache | DaemonClient"] = None,
+        compact: bool = False,
+        policy: T.Optional["TargetPolicy"] = None,
+        sample: int = 0,
+        histogram: T.Optional["VersionHistogram"] = None,
+    ) -> None:
+        """`compact` keeps the good files in a ClassFileColumns, which takes
+        far less memory than a list when there are many of them. The files
+        that a rule of `policy` applies to are checked against its target
+        instead of `target`.
+
+        With a `sample`, only that many classes of each archive are read at
+        first, see read_jar(). Archives where one of them is bad are read
+        in full.
+
+        Every checked class is also counted in `histogram`, if given."""
+        self.target = parse_version(target)
+        self.cache = cache
+        self.policy = policy
+        self.sample = sample
+        self.histogram = histogram
+        # The archives whose results are based on a sample, with how many
+        # of their classes were read and how many weren't
+        self.sampled_count = 0
+        self.sampled_read = 0
+        self.sampled_unread = 0
+        self.good: list[GoodFile] | ClassFileColumns = (
+            ClassFileColumns() if compact else []
+        )
         self.bad: list[BadFile] = []
         self.skipped: list[SkippedFile] = []
+        self.good_count = 0
+        self.bad_count = 0
+        self.skipped_count = 0
+        # Where iter_many() takes the results from, instead of the lists
+        self.__stream: T.Optional[deque[Result]] = None
+        self.__stream_good = False
 
     def add(
         self, version: int, loc: Loc, target_version: T.Optional[int] = None
     ) -> None:
         if target_version is None:
-            target_version = self.target
+            target_version = self.__target_of(loc)
 
         if CVVMagic.__is_module_info(loc) and target_version < 9:
             self.__on_skipped(SkippedModuleInfo(loc))
             return
 
-        cf = ClassFile(
-            loc,
-            encoded_version=self.__format_version(version),
-            expected_version=self.__format_version(target_version),
-        )
+        if (
+            version <= target_version
+            and self.__stream is not None
+            and not self.__stream_good
+        ):
+            # Nobody gets to see it
+            self.good_count += 1
+            return
+
+        cf = ClassFile(loc, version, target_version)
 
         if version <= target_version:
             self.__on_good(cf)
@@ -91,60 +327,189 @@ class CVVMagic:
             self.__on_bad(cf)
 
     def do_class(self, class_file: T.IO[bytes], filename: FileLoc) -> None:
-        version = self.__extract_version(class_file)
-        self.add(version, filename)
+        self.__add_class_file(self.__extract_version(class_file), filename)
+
+    def __add_class_file(self, version: int, loc: FileLoc) -> None:
+        if self.histogram is not None:
+            self.histogram.add_class(loc, version)
+        self.add(version, loc)
 
     def do_jar(self, jar: ZipFile, jar_path: FileLoc) -> None:
-        def jar_loc(path: str) -> JarLoc:
-            return JarLoc(jar_path, path)
+        self.check_jar(self.read_jar(ZipDirectory(jar)), jar_path)
 
+    @classmethod
+    def read_jar(
+        cls,
+        jar: ArchiveDirectory,
+        start: int = 0,
+        stop: T.Optional[int] = None,
+        digest: bool = False,
+        depth: int = 0,
+        prefix: str = "",
+        sample: int = 0,
+    ) -> JarScan:
+        """Read the versions of the classes in `jar`, or only of those among
+        the members from `start` to `stop`, and of the archives inside of it
+
+        Members are filtered by their raw names, so only the names of
+        classes and archives get decoded. With a `prefix`, only the members
+        under it are read, as if it was the root of the jar.
+
+        With a `sample`, only that many random classes are read from the
+        jar and from each of its multi-release dirs, plus every
+        module-info. The others are left out of the scan. The same jar
+        always gets the same sample.
+        """
         is_multirelease = False
+        manifest = jar.index(prefix + "META-INF/MANIFEST.MF")
+        if manifest is not None:
+
+            def decode_line(line: bytes) -> str:
+                # The Manifest spec requires that the file is utf-8 encoded.
+                # Unfortunately, stuff like the maven-jar-plugin can generate
+                # an invalid manifest when it blindly copies the author name
+                return line.decode("utf-8", "replace").rstrip("\r\n")
+
+            lines = [decode_line(line) for line in jar.read(manifest).split(b"\n")]
+            is_multirelease = "Multi-Release: true" in lines
+
+        archive_suffixes = tuple(s.encode() for s in cls.archive_suffixes)
+        nesting = depth < cls.max_nesting
+        classes: list[tuple[str, int | None]] = []
+        nested: list[tuple[str, JarScan | str]] = []
+        # With a sample, the positions in `classes` of the classes whose
+        # version is needed, by the version they are checked against, and
+        # their indices in the jar
+        needed: dict[int | None, list[int]] = {}
+        indices: dict[int, int] = {}
+        for i in range(start, len(jar) if stop is None else stop):
+            if nesting and jar.endswith(i, archive_suffixes):
+                path = jar.name(i)
+                if path.startswith(prefix):
+                    scan = cls.__read_nested_jar(jar, i, depth + 1, sample)
+                    nested.append((path.removeprefix(prefix), scan))
+                continue
+            if not jar.endswith(i, b"class"):
+                continue
+
+            path = jar.name(i)
+            if not path.startswith(prefix):
+                continue
+            path = path.removeprefix(prefix)
+            version = None
+            match cls.__get_multirelease_target_version(path):
+                case int() if not is_multirelease:
+                    pass
+                case int() | None as target_version if sample:
+                    needed.setdefault(target_version, []).append(len(classes))
+                    indices[len(classes)] = i
+                case int() | None:
+                    version = cls.__parse_version(jar.read_head(i, 8))
+            classes.append((path, version))
+
+        unsampled = 0
+        if needed:
+            rng = random.Random(len(jar))
+            unread: set[int] = set()
+            for positions in needed.values():
+                if len(positions) > sample:
+                    picked = set(rng.sample(positions, sample))
+                    picked.update(
+                        p
+                        for p in positions
+                        if cls.__module_info_jar_pattern.fullmatch(classes[p][0])
+                    )
+                    unread.update(p for p in positions if p not in picked)
+            for p, i in indices.items():
+                if p not in unread:
+                    version = cls.__parse_version(jar.read_head(i, 8))
+                    classes[p] = (classes[p][0], version)
+            classes = [c for p, c in enumerate(classes) if p not in unread]
+            unsampled = len(unread)
+
+        return JarScan(
+            is_multirelease,
+            classes,
+            nested,
+            jar.digest() if digest else None,
+            unsampled,
+        )
+
+    @classmethod
+    def __read_nested_jar(
+        cls, jar: ArchiveDirectory, index: int, depth: int, sample: int
+    ) -> JarScan | str:
         try:
-            manifest = jar.open("META-INF/MANIFEST.MF", "r")
-        except KeyError:
-            pass
-        else:
-            with manifest:
+            with jar.open_nested(index) as nested:
+                return cls.read_jar(nested, depth=depth, sample=sample)
+        except BadZipFile as e:
+            return f"Not a valid archive: {e}"
+
+    @classmethod
+    def read_binpkg(cls, path: str, digest: bool = False, sample: int = 0) -> JarScan:
+        """Read the versions of the class files and archives installed by
+        the binary package at `path`, as if its image was an archive
+
+        The package is streamed, each archive in it is read into memory or,
+        if it is too big for that, into a temporary file. The members of
+        the scan are named by their paths in the image. A `sample` is taken
+        from each archive like read_jar() does, the class files of the
+        package are always read.
+        """
+        classes: list[tuple[str, int | None]] = []
+        nested: list[tuple[str, JarScan | str]] = []
+        with open(path, "rb") as f:
+            for name, member, file in iter_image(f, path.endswith(".gpkg.tar")):
+                if name.endswith(".class"):
+                    classes.append((name, cls.__extract_version(file)))
+                elif name.endswith(cls.archive_suffixes):
+                    try:
+                        with open_stream_archive(file, member.size) as jar:
+                            nested.append(
+                                (name, cls.read_jar(jar, depth=1, sample=sample))
+                            )
+                    except BadZipFile as e:
+                        nested.append((name, f"Not a valid archive: {e}"))
+        # There is no central directory to compare, a cached scan is only
+        # used while the stat of the package doesn't change
+        return JarScan(False, classes, nested, b"" if digest else None)
+
+    def check_jar(self, scan: JarScan, jar_path: FileLoc | JarLoc) -> None:
+        """Check the classes of a jar read by read_jar()"""
+
+        def jar_loc(path: str) -> JarLoc:
+            return JarLoc(jar_path, path)
 
-                def decode_line(line: bytes) -> str:
-                    # The Manifest spec requires that the file is utf-8 encoded.
-                    # Unfortunately, stuff like the maven-jar-plugin can generate
-                    # an invalid manifest when it blindly copies the author name
-                    return line.decode("utf-8", "replace").rstrip("\r\n")
+        if self.histogram is not None:
+            self.histogram.add_jar(jar_path, scan)
 
-                lines = [decode_line(line) for line in manifest.readlines()]
-                is_multirelease = "Multi-Release: true" in lines
+        # Unless the policy looks into archives, a jar has a single target
+        jar_target = None
+        if self.policy is None or not self.policy.has_member_rules:
+            jar_target = self.__target_of(jar_path)
 
         invalid_version_dirs: set[str] = set()
         seen_skipped_dirs: set[str] = set()
-        for path in jar.namelist():
-            if not path.endswith("class"):
-                continue
-
-            loc = jar_loc(path)
-
-            with jar.open(path, "r") as class_file:
-                target_version = None
-                match self.__get_multirelease_target_version(path):
-                    case int(tv):
-                        if is_multirelease:
-                            target_version = tv
-                        else:
-                            version_dir = path.split("/", 3)[:3]
-                            invalid_version_dirs.add("/".join(version_dir))
-                            continue
-                    case (ver_dir, reason):
-                        if ver_dir not in seen_skipped_dirs:
-                            seen_skipped_dirs.add(ver_dir)
-                            self.__on_skipped(
-                                SkippedVersionDir(jar_loc(ver_dir), reason)
-                            )
+        for path, version in scan.classes:
+            target_version = jar_target
+            match self.__get_multirelease_target_version(path):
+                case int(tv):
+                    if scan.is_multirelease:
+                        target_version = tv
+                    else:
+                        version_dir = path.split("/", 3)[:3]
+                        invalid_version_dirs.add("/".join(version_dir))
                         continue
-                    case None:
-                        pass
+                case (ver_dir, reason):
+                    if ver_dir not in seen_skipped_dirs:
+                        seen_skipped_dirs.add(ver_dir)
+                        self.__on_skipped(SkippedVersionDir(jar_loc(ver_dir), reason))
+                    continue
+                case None:
+                    pass
 
-                version = self.__extract_version(class_file)
-                self.add(version, loc, target_version)
+            assert version is not None
+            self.add(version, jar_loc(path), target_version)
 
         if len(invalid_version_dirs):
             self.__on_bad(
@@ -154,18 +519,354 @@ class CVVMagic:
                 )
             )
 
-    def do(self, filename: str) -> None:
-        if not os.path.islink(filename):
+        for path, nested in scan.nested:
+            if isinstance(nested, str):
+                self.__on_skipped(SkippedNestedArchive(jar_loc(path), nested))
+            else:
+                self.check_jar(nested, jar_loc(path))
+
+    @classmethod
+    def find_files(cls, paths: T.Iterable[str], recurse: bool) -> T.Iterator[str]:
+        """The files in `paths` and, if `recurse`, the class files and
+        archives in the directories in `paths`, for do_many().
+
+        Names are checked before anything is stat()ed, so unrelated files
+        cost nothing. Symlinks to files are skipped like do() skips them, so
+        the results can be checked with `links_skipped`. Symlinks to
+        directories are only followed if they are in `paths`. A file with
+        several hardlinks is only yielded once.
+        """
+        suffixes = (
+            ".class",
+            *cls.archive_suffixes,
+            *cls.jmod_suffixes,
+            *cls.binpkg_suffixes,
+        )
+        seen: set[tuple[int, int]] = set()
+        for path in paths:
+            if not path.endswith(suffixes) and not recurse:
+                continue
+            try:
+                st = os.stat(path, follow_symlinks=False)
+                # A symlink given as a directory to go into is followed,
+                # like os.walk() follows its top
+                if stat.S_ISLNK(st.st_mode) and recurse:
+                    st = os.stat(path)
+                    if not stat.S_ISDIR(st.st_mode):
+                        continue
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode) and path.endswith(suffixes):
+                if (st.st_dev, st.st_ino) not in seen:
+                    seen.add((st.st_dev, st.st_ino))
+                    yield path
+            elif recurse and stat.S_ISDIR(st.st_mode):
+                yield from cls.__walk(path, suffixes, seen)
+
+    @staticmethod
+    def __walk(
+        top: str, suffixes: tuple[str, ...], seen: set[tuple[int, int]]
+    ) -> T.Iterator[str]:
+        # Same order as os.walk(), but only the directories get stat()ed,
+        # for the device of the files in them
+        dirs = [top]
+        while dirs:
+            directory = dirs.pop()
+            subdirs = []
+            dev = None
+            try:
+                entries = os.scandir(directory)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.name.endswith(suffixes) and entry.is_file(
+                            follow_symlinks=False
+                        ):
+                            if dev is None:
+                                dev = os.stat(directory).st_dev
+                            if (dev, entry.inode()) not in seen:
+                                seen.add((dev, entry.inode()))
+                                yield entry.path
+                    except OSError:
+                        continue
+            dirs.extend(reversed(subdirs))
+
+    def do(self, filename: str, links_skipped: bool = False) -> None:
+        """Check the class file or archive `filename`, unless it is a
+        symlink. With `links_skipped` the caller already left symlinks out,
+        like find_files() does, and it isn't checked again."""
+        if links_skipped or not os.path.islink(filename):
             if filename.endswith(".class"):
                 with open(filename, "rb") as class_file:
                     self.do_class(class_file, FileLoc(filename))
-            if filename.endswith(".jar"):
-                with ZipFile(filename, "r") as jar:
-                    self.do_jar(jar, FileLoc(filename))
+            if self.__is_archive(filename):
+                st, scan = self.__lookup(filename)
+                if scan is None:
+                    scan = self.read_archive(filename, st is not None, self.sample)
+                    self.__check_read(filename, st, scan)
+                else:
+                    self.check_jar(scan, FileLoc(filename))
+
+    def do_many(
+        self, filenames: T.Iterable[str], jobs: int = 1, links_skipped: bool = False
+    ) -> None:
+        """Check every file in `filenames` like do() does, using `jobs`
+        worker processes.
+
+        The workers only read the files, the results are checked and merged
+        in the same order as a serial run would produce them, so the output
+        doesn't depend on `jobs`.
+        """
+        if jobs <= 1:
+            for filename in filenames:
+                self.do(filename, links_skipped)
+        else:
+            for _ in self.__do_parallel(filenames, jobs, links_skipped):
+                pass
+
+    def iter_many(
+        self,
+        filenames: T.Iterable[str],
+        jobs: int = 1,
+        good: bool = False,
+        links_skipped: bool = False,
+    ) -> T.Iterator[Result]:
+        """Check files like do_many() does, but yield the results as soon as
+        they are known, together with their status.
+
+        Nothing is collected in `good`, `bad` or `skipped`, and good files are
+        only yielded if `good` is set, so the memory needed doesn't grow
+        with the number of files checked. The counters are still updated.
+        Stopping the iteration stops the check.
+        """
+        stream: deque[Result] = deque()
+        self.__stream, self.__stream_good = stream, good
+        files = (
+            (self.do(filename, links_skipped) for filename in filenames)
+            if jobs <= 1
+            else self.__do_parallel(filenames, jobs, links_skipped)
+        )
+        try:
+            for _ in files:
+                while stream:
+                    yield stream.popleft()
+        finally:
+            self.__stream = None
+            files.close()
+
+    def __do_parallel(
+        self, filenames: T.Iterable[str], jobs: int, links_skipped: bool
+    ) -> T.Iterator[None]:
+        """Check files for do_many() with a process pool, yields after each
+        checked file
+
+        Only a bounded number of reads is in flight at once, so checking
+        starts right away and the results don't pile up.
+        """
+        digest = self.cache is not None
+        # The files to check in order, each with either its cached scan or
+        # the number of units its results are made of
+        files: deque[tuple[str, os.stat_result | None, JarScan | int]] = deque()
+        # The tasks, each reading a list of units, and their unused results.
+        # As the tasks are in order, so are the results.
+        tasks: deque[Future[list[JarScan | int]]] = deque()
+        results: deque[JarScan | int] = deque()
+        # Loose class files are quick to read, they are batched together
+        classes: list[_WorkUnit] = []
+
+        def check_files() -> T.Iterator[None]:
+            while files:
+                filename, st, todo = files[0]
+                if isinstance(todo, int) and len(results) < todo:
+                    return
+                files.popleft()
+
+                if isinstance(todo, JarScan):
+                    self.check_jar(todo, FileLoc(filename))
+                    yield
+                    continue
+
+                parts = [results.popleft() for _ in range(todo)]
+                if filename.endswith(".class"):
+                    self.__add_class_file(T.cast(int, parts[0]), FileLoc(filename))
+                else:
+                    scan = T.cast(JarScan, parts[0])
+                    for part in T.cast(list[JarScan], parts[1:]):
+                        scan.classes.extend(part.classes)
+                        scan.nested.extend(part.nested)
+                        scan.digest = part.digest
+                    self.__check_read(filename, st, scan)
+                yield
+
+        pool = ProcessPoolExecutor(jobs)
+
+        def submit(units: list[_WorkUnit]) -> None:
+            tasks.append(pool.submit(_read_work_units, units, digest))
+
+        try:
+            for filename in filenames:
+                if not links_skipped and os.path.islink(filename):
+                    continue
+                if filename.endswith(".class"):
+                    files.append((filename, None, 1))
+                    classes.append(_WorkUnit(filename))
+                    if len(classes) >= self.class_batch:
+                        submit(classes)
+                        classes = []
+                elif self.__is_archive(filename):
+                    # Keep the units in order, pending class files come first
+                    if classes:
+                        submit(classes)
+                        classes = []
+                    st, scan = self.__lookup(filename)
+                    if scan is not None:
+                        files.append((filename, st, scan))
+                    else:
+                        units = self.__split_jar(filename)
+                        files.append((filename, st, len(units)))
+                        for unit in units:
+                            submit([unit])
+                else:
+                    continue
+
+                while len(tasks) > jobs * 4:
+                    results.extend(tasks.popleft().result())
+                    yield from check_files()
+                yield from check_files()
+
+            if classes:
+                submit(classes)
+            while tasks:
+                results.extend(tasks.popleft().result())
+                yield from check_files()
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def __check_read(
+        self, filename: str, st: os.stat_result | None, scan: JarScan
+    ) -> None:
+        """Check the archive `filename` that was just read as `scan`"""
+        unsampled = self.__unsampled(scan)
+        if unsampled:
+            # Check the sample on its own first, and if it has anything bad
+            # read everything
+            probe = type(self)(format_version(self.target), policy=self.policy)
+            probe.check_jar(scan, FileLoc(filename))
+            if probe.bad_count:
+                scan = self.read_archive(filename, st is not None)
+                unsampled = 0
+        if unsampled:
+            self.sampled_count += 1
+            self.sampled_read += self.__class_count(scan)
+            self.sampled_unread += unsampled
+        else:
+            self.__store(filename, st, scan)
+        self.check_jar(scan, FileLoc(filename))
+
+    @classmethod
+    def __unsampled(cls, scan: JarScan) -> int:
+        return scan.unsampled + sum(
+            cls.__unsampled(n) for _, n in scan.nested if isinstance(n, JarScan)
+        )
+
+    @classmethod
+    def __class_count(cls, scan: JarScan) -> int:
+        return len(scan.classes) + sum(
+            cls.__class_count(n) for _, n in scan.nested if isinstance(n, JarScan)
+        )
+
+    def __split_jar(self, filename: str) -> list[_WorkUnit]:
+        if self.sample:
+            return [_WorkUnit(filename, sample=self.sample)]
+        if filename.endswith((*self.archive_suffixes, *self.jmod_suffixes)) and (
+            os.path.getsize(filename) >= self.split_size
+        ):
+            with self.__open_archive(filename) as jar:
+                count = len(jar)
+            if count > self.split_members:
+                return [
+                    _WorkUnit(filename, (start, min(start + self.split_members, count)))
+                    for start in range(0, count, self.split_members)
+                ]
+        return [_WorkUnit(filename)]
+
+    def __lookup(self, filename: str) -> tuple[os.stat_result | None, JarScan | None]:
+        """Look `filename` up in the cache, if there is one
+
+        Returns the stat result to store the scan of the file with, if it
+        has to be read, and the cached scan if there was one.
+        """
+        if self.cache is None:
+            return None, None
+        return self.cache.lookup(filename)
+
+    def __store(self, filename: str, st: os.stat_result | None, scan: JarScan) -> None:
+        if self.cache is not None and st is not None:
+            self.cache.store(filename, st, scan)
+
+    @classmethod
+    def read_archive(
+        cls, filename: str, digest: bool = False, sample: int = 0
+    ) -> JarScan:
+        """Read any kind of archive that do() checks, see read_jar()"""
+        scan = cls._read_work_unit(_WorkUnit(filename, sample=sample), digest)
+        return T.cast(JarScan, scan)
+
+    @classmethod
+    def _read_work_unit(cls, unit: _WorkUnit, digest: bool) -> JarScan | int:
+        """Read a single unit produced by do_many()
+
+        This is the version of a class file or the scan of (a part of) a
+        jar or of a binary package. Only the last part of a split jar gets
+        the digest of the whole jar.
+        """
+        if unit.path.endswith(".class"):
+            with open(unit.path, "rb") as class_file:
+                return cls.__extract_version(class_file)
+        if unit.path.endswith(cls.binpkg_suffixes):
+            return cls.read_binpkg(unit.path, digest, unit.sample)
+
+        prefix = cls.jmod_classes if unit.path.endswith(cls.jmod_suffixes) else ""
+        with cls.__open_archive(unit.path) as jar:
+            if unit.members is None:
+                return cls.read_jar(
+                    jar, digest=digest, prefix=prefix, sample=unit.sample
+                )
+            start, stop = unit.members
+            scan = cls.read_jar(jar, start, stop, prefix=prefix)
+            if digest and stop == len(jar):
+                scan.digest = jar.digest()
+            return scan
+
+    def __target_of(self, loc: Loc) -> int:
+        if self.policy is not None:
+            target = self.policy.lookup(loc)
+            if target is not None:
+                return target
+        return self.target
+
+    @classmethod
+    def __is_archive(cls, filename: str) -> bool:
+        return filename.endswith(
+            (*cls.archive_suffixes, *cls.jmod_suffixes, *cls.binpkg_suffixes)
+        )
+
+    @classmethod
+    def __open_archive(cls, filename: str) -> T.ContextManager[CentralDirectory]:
+        if filename.endswith(cls.jmod_suffixes):
+            return open_jmod(filename)
+        return open_archive(filename)
 
     @classmethod
     def __extract_version(cls, file: T.IO[bytes]) -> int:
-        data = file.read(8)
+        return cls.__parse_version(file.read(8))
+
+    @classmethod
+    def __parse_version(cls, data: bytes) -> int:
         if len(data) != 8:
             raise ValueError(
                 f"Need the first 8 bytes of a java .class file, got: {len(data)}"
@@ -220,15 +921,28 @@ class CVVMagic:
 
         return ptn.fullmatch(target) is not None
 
-    @classmethod
-    def __format_version(cls, version: int) -> str:
-        return f"1.{version}" if version < 9 else f"{version}"
-
     def __on_good(self, goodFile: GoodFile) -> None:
-        self.good.append(goodFile)
+        self.good_count += 1
+        if self.__stream is None:
+            self.good.append(goodFile)
+        elif self.__stream_good:
+            self.__stream.append(("good", goodFile))
 
     def __on_bad(self, badFile: BadFile) -> None:
-        self.bad.append(badFile)
+        self.bad_count += 1
+        if self.__stream is None:
+            self.bad.append(badFile)
+        else:
+            self.__stream.append(("bad", badFile))
 
     def __on_skipped(self, skippedFile: SkippedFile) -> None:
-        self.skipped.append(skippedFile)
+        self.skipped_count += 1
+        if self.__stream is None:
+            self.skipped.append(skippedFile)
+        else:
+            self.__stream.append(("skipped", skippedFile))
+
+
+def _read_work_units(units: list[_WorkUnit], digest: bool) -> list[JarScan | int]:
+    """Entry point of the worker processes of CVVMagic.do_many()"""
+    return [CVVMagic._read_work_unit(unit, digest) for unit in units]
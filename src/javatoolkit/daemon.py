@@ -0,0 +1,216 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""A local service that keeps what was read from jars in memory
+
+class-version-verify.py and findclass ask it over a Unix socket with
+--daemon, instead of reading the same system jars again in every ebuild.
+Requests and responses are single lines of JSON. Clients only talk to a
+service of their own user.
+"""
+
+from collections import OrderedDict
+from zipfile import BadZipFile
+from .cvv import CVVMagic, JarScan
+from .ziputil import open_archive
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import typing as T
+
+
+def socket_path() -> str:
+    """Where the service listens, $JAVATOOLKIT_DAEMON_SOCKET or a socket in
+    a directory of the user below the runtime dir"""
+    path = os.environ.get("JAVATOOLKIT_DAEMON_SOCKET")
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return f"{runtime_dir}/javatoolkit-{os.getuid()}/daemon.sock"
+
+
+def make_private_dir(path: str) -> None:
+    """Create the directory `path` only the user can use, raises an OSError
+    if it already exists and another user could change it"""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{path} isn't a private directory of the user")
+
+
+def _check_peer(sock: socket.socket, path: str) -> None:
+    """Raise a PermissionError if the other end of `sock` doesn't run as
+    the user"""
+    if hasattr(socket, "SO_PEERCRED"):
+        creds = sock.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+        )
+        _, uid, _ = struct.unpack("3i", creds)
+    else:
+        # Without credentials the socket has to belong to the user
+        uid = os.stat(path).st_uid
+    if uid != os.getuid():
+        raise PermissionError(f"{path} is served by another user")
+
+
+class DaemonError(Exception):
+    """The service couldn't answer a request"""
+
+
+_Entry = tuple[tuple[int, ...], T.Any]
+
+
+class JarDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Answer requests for the scans and member names of archives
+
+    What was read from an archive is kept until the (device, inode, size,
+    mtime_ns) of the file change, for up to `max_entries` archives.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self.__lock = threading.Lock()
+        # (op, path) -> (identity of the file, result)
+        self.__entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o600)
+
+    def answer(self, request: dict[str, T.Any]) -> T.Any:
+        """The answer to a single request"""
+        match request:
+            case {"op": "ping"}:
+                return "pong"
+            case {"op": "scan" | "names" as op, "path": str(path)}:
+                return self.__get(op, path)
+            case _:
+                raise DaemonError(f"Bad request: {request}")
+
+    def __get(self, op: str, path: str) -> T.Any:
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            raise DaemonError(str(e)) from e
+        identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        key = (op, path)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[0] == identity:
+                self.__entries.move_to_end(key)
+                return entry[1]
+
+        try:
+            if op == "scan":
+                result = CVVMagic.read_archive(path).to_json()
+            else:
+                with open_archive(path) as jar:
+                    result = [jar.name(i) for i in range(len(jar))]
+        except (OSError, BadZipFile, ValueError) as e:
+            raise DaemonError(str(e)) from e
+
+        with self.__lock:
+            self.__entries[key] = (identity, result)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+        return result
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: JarDaemon
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                response = {"result": self.server.answer(json.loads(line))}
+            except (DaemonError, ValueError) as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class DaemonClient:
+    """A connection to a running JarDaemon
+
+    It can stand in for the ScanCache of CVVMagic, every lookup is then
+    answered by the service. Requests from several threads are sent one
+    after another.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        """Connect to the service at `path`, raises an OSError if it isn't
+        running or runs as another user"""
+        path = path or socket_path()
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.__socket.connect(path)
+            _check_peer(self.__socket, path)
+        except OSError:
+            self.__socket.close()
+            raise
+        self.__file = self.__socket.makefile("rwb")
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, path: str | None = None) -> T.Optional["DaemonClient"]:
+        """A client of the service at `path`, or None if it isn't running
+        or runs as another user"""
+        try:
+            return cls(path)
+        except OSError:
+            return None
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *exc_info: T.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__file.close()
+        self.__socket.close()
+
+    def request(self, op: str, **args: T.Any) -> T.Any:
+        """Send a request and wait for its answer, raises a DaemonError if
+        there is none"""
+        try:
+            with self.__lock:
+                request = json.dumps({"op": op, **args}).encode("utf-8")
+                self.__file.write(request + b"\n")
+                self.__file.flush()
+                line = self.__file.readline()
+        except OSError as e:
+            raise DaemonError(str(e)) from e
+        if not line:
+            raise DaemonError("The service closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise DaemonError(response["error"])
+        return response["result"]
+
+    def scan(self, path: str) -> JarScan:
+        """The scan of the archive at `path`, like CVVMagic reads it"""
+        return JarScan.from_json(self.request("scan", path=os.path.abspath(path)))
+
+    def names(self, path: str) -> list[str]:
+        """The names of the members of the archive at `path`"""
+        return self.request("names", path=os.path.abspath(path))
+
+    def lookup(self, path: str) -> tuple[None, JarScan | None]:
+        """Like ScanCache.lookup(), but nothing needs to be stored, and None
+        is returned if the service can't read the file"""
+        try:
+            return None, self.scan(path)
+        except DaemonError:
+            return None, None
+
+    def store(self, path: str, st: T.Any, scan: JarScan) -> None:
+        pass
@@ -0,0 +1,106 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""Class version counts per archive, for class-version-verify.py"""
+
+from collections import Counter
+from .cvv import FileLoc, JarLoc, JarScan, format_version
+import os
+import typing as T
+
+
+class VersionHistogram:
+    """Count the classes of each version in every checked archive
+
+    Only counters are kept, so the memory needed grows with the number of
+    archives and not with the number of classes. Loose class files are
+    counted by the directory they are in. The maximum versions are also
+    kept for every top-level directory, which is the first directory below
+    one of the `roots` or, for files that aren't under any of them, the
+    directory the file is in.
+    """
+
+    def __init__(self, roots: T.Iterable[str] = ()) -> None:
+        # Longest first, so that the innermost root is used
+        self.roots = sorted((r.rstrip("/") or "/" for r in roots), key=len)[::-1]
+        self.versions: dict[str, Counter[int]] = {}
+        self.multirelease_layers: dict[str, int] = {}
+        self.dir_max: dict[str, int] = {}
+
+    def add_jar(self, jar: FileLoc | JarLoc, scan: JarScan) -> None:
+        """Count the classes of the jar `jar` read as `scan`, but not those
+        of the archives inside of it"""
+        key = self.__key(jar)
+        counter = self.versions.setdefault(key, Counter())
+        counter.update(v for _, v in scan.classes if v is not None)
+        # Only the layers the JVM uses, like CVVMagic checks them
+        layers = {
+            layer
+            for path, _ in scan.classes
+            if path.startswith("META-INF/versions/") and path.count("/") > 2
+            if (layer := path.split("/", 3)[2]).isdecimal() and int(layer) >= 9
+        }
+        if layers:
+            self.multirelease_layers[key] = len(layers)
+        if counter:
+            self.__add_dir(jar, max(counter))
+
+    def add_class(self, loc: FileLoc, version: int) -> None:
+        """Count the loose class file at `loc`"""
+        key = os.path.dirname(loc.path) or "."
+        self.versions.setdefault(key, Counter())[version] += 1
+        self.__add_dir(loc, version)
+
+    def to_json(self) -> dict[str, T.Any]:
+        """The counts as plain data, with the keys sorted so that the JSON of
+        two builds can be diffed"""
+        return {
+            "archives": {
+                key: {
+                    "classes": {str(v): n for v, n in sorted(c.items())},
+                    "max": max(c, default=None),
+                    "multi_release_layers": self.multirelease_layers.get(key, 0),
+                }
+                for key, c in sorted(self.versions.items())
+            },
+            "dirs": dict(sorted(self.dir_max.items())),
+        }
+
+    def format_table(self) -> T.Iterator[str]:
+        """The counts as lines of a table"""
+        yield f"{'Max':>5} {'Classes':>8} {'MR':>3}  {'Versions':<24} Archive"
+        for key, counter in sorted(self.versions.items()):
+            versions = " ".join(
+                f"{format_version(v)}:{n}" for v, n in sorted(counter.items())
+            )
+            top = format_version(max(counter)) if counter else "-"
+            layers = self.multirelease_layers.get(key, "-")
+            yield f"{top:>5} {counter.total():>8} {layers:>3}  {versions:<24} {key}"
+        yield ""
+        yield f"{'Max':>5}  Directory"
+        for directory, version in sorted(self.dir_max.items()):
+            yield f"{format_version(version):>5}  {directory}"
+
+    def __add_dir(self, loc: FileLoc | JarLoc, version: int) -> None:
+        directory = self.__top_dir(
+            loc.path if isinstance(loc, FileLoc) else loc.file.path
+        )
+        if version > self.dir_max.get(directory, -1):
+            self.dir_max[directory] = version
+
+    def __top_dir(self, path: str) -> str:
+        for root in self.roots:
+            if path.startswith(root + "/") or (root == "/" and path.startswith("/")):
+                rest = path[len(root) :].lstrip("/")
+                if "/" in rest:
+                    return os.path.join(root, rest.split("/", 1)[0])
+                return root
+        return os.path.dirname(path) or "."
+
+    @classmethod
+    def __key(cls, loc: FileLoc | JarLoc) -> str:
+        match loc:
+            case FileLoc(path):
+                return path
+            case JarLoc(jar, member):
+                return f"{cls.__key(jar)}!/{member}"
@@ -0,0 +1,117 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""Expand a classpath through the Class-Path of the manifests of its jars"""
+
+from zipfile import BadZipFile
+from urllib.parse import unquote, urlsplit
+from .classpath import Classpath
+from .parser.manifest import ManifestParser
+from .parser.tree import ParseError
+from .ziputil import open_archive
+import io
+import os
+import re
+import typing as T
+
+
+# How much of a manifest is read at first, the main section is nearly
+# always in there even when the sections of signed entries follow it
+_MANIFEST_HEAD = 64 * 1024
+
+_SECTION_END = re.compile(rb"\r?\n\r?\n|\r\r")
+
+
+def read_main_section(path: str) -> str | None:
+    """The main section of the manifest of the jar at `path`, or None if it
+    has no manifest or can't be read"""
+    try:
+        with open_archive(path) as jar:
+            index = jar.index("META-INF/MANIFEST.MF")
+            if index is None:
+                return None
+            data = jar.read_head(index, _MANIFEST_HEAD)
+            end = _SECTION_END.search(data)
+            if end is None and len(data) == _MANIFEST_HEAD:
+                data = jar.read(index)
+                end = _SECTION_END.search(data)
+    except (OSError, BadZipFile):
+        return None
+    if end is not None:
+        data = data[: end.start()]
+    return data.decode("utf-8", errors="replace")
+
+
+class ManifestClasspath:
+    """Expand classpaths through the Class-Path attributes of the manifests
+    of their jars, and those of the jars these point at
+
+    The Class-Path of each jar is only read once for as long as the (device,
+    inode, size, mtime_ns) of the file stay the same, so a chain that is
+    shared by several jars or classpaths is read once.
+    """
+
+    def __init__(self) -> None:
+        # Identity of a jar -> its Class-Path entries, as they are written
+        self.__class_paths: dict[tuple[int, ...], list[str]] = {}
+
+    def class_path(self, jar: str) -> list[str]:
+        """The paths the Class-Path of the manifest of `jar` points at, with
+        relative URLs resolved against the directory of `jar`. Other URLs
+        than file: ones are left out, like the JVM does."""
+        try:
+            st = os.stat(jar)
+        except OSError:
+            return []
+        identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        urls = self.__class_paths.get(identity)
+        if urls is None:
+            urls = self.__class_paths[identity] = self.__read_class_path(jar)
+
+        paths = []
+        base = os.path.dirname(os.path.abspath(jar))
+        for url in urls:
+            parts = urlsplit(url)
+            if parts.scheme not in ("", "file") or parts.netloc:
+                continue
+            path = os.path.join(base, unquote(parts.path))
+            paths.append(os.path.normpath(path) + ("/" if path.endswith("/") else ""))
+        return paths
+
+    def expand(self, classpath: Classpath | T.Iterable[str]) -> Classpath:
+        """`classpath` with what the manifests of its jars point at right
+        after each jar, like the JVM loads classes from them
+
+        Every entry comes only once, so a jar that points back at one of the
+        jars before it doesn't make a cycle. Entries from manifests that
+        don't exist are left out.
+        """
+        if isinstance(classpath, Classpath):
+            classpath = classpath.classpath
+        result = Classpath()
+        seen: set[str] = set()
+        # The entries still to go, the next one at the end
+        stack = [(entry, True) for entry in reversed(list(classpath)) if entry]
+        while stack:
+            entry, given = stack.pop()
+            # Given entries can be relative, those from manifests aren't
+            key = os.path.abspath(entry)
+            if key in seen or not (given or os.path.exists(entry)):
+                continue
+            seen.add(key)
+            result.append(entry)
+            if not entry.endswith("/") and os.path.isfile(entry):
+                stack += ((path, False) for path in reversed(self.class_path(entry)))
+        return result
+
+    @staticmethod
+    def __read_class_path(jar: str) -> list[str]:
+        main_section = read_main_section(jar)
+        if main_section is None:
+            return []
+        try:
+            node = ManifestParser().parse(io.StringIO(main_section))
+        except ParseError:
+            return []
+        class_path = node.find_node("Class-Path")
+        return class_path.value.split() if class_path is not None else []
@@ -0,0 +1,136 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""The classpaths of installed Java packages, from their package.env files"""
+
+from .classpath import Classpath
+import glob
+import os
+import typing as T
+
+
+def parse_env(path: str) -> dict[str, str]:
+    """The KEY="value" assignments of the env file at `path`"""
+    env = {}
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            key, sep, value = line.strip().partition("=")
+            if sep and key.isidentifier():
+                env[key] = value.strip('"')
+    return env
+
+
+class PackageResolver:
+    """Resolve the classpaths of the installed packages and of everything
+    they depend on
+
+    The package.env (or classpath.env, for old packages) of each package is
+    read at most once. Its CLASSPATH has its jars, and its DEPEND the
+    packages it needs, separated by ":". A dependency like jar@package
+    stands for a single jar of a package without its dependencies.
+
+    The classpath of each package with its dependencies is kept once it is
+    resolved, so shared dependencies are only resolved once. The packages
+    that depend on each other in a cycle all get the jars of the whole
+    cycle, each with its own jars first.
+    """
+
+    def __init__(self, share_dir: str = "/usr/share") -> None:
+        self.share_dir = share_dir
+        self.__envs: dict[str, dict[str, str] | None] = {}
+        self.__closures: dict[str, tuple[str, ...]] = {}
+
+    def packages(self) -> list[str]:
+        """The names of the installed packages"""
+        names = [
+            os.path.basename(os.path.dirname(path))
+            for pattern in ("*/package.env", "*/classpath.env")
+            for path in glob.glob(f"{self.share_dir}/{pattern}")
+        ]
+        names += map(os.path.basename, glob.glob(f"{self.share_dir}/java/packages/*"))
+        return list(dict.fromkeys(names))
+
+    def env(self, package: str) -> dict[str, str] | None:
+        """The env file of `package`, None if it isn't installed"""
+        if package not in self.__envs:
+            self.__envs[package] = None
+            for path in (
+                f"{self.share_dir}/{package}/package.env",
+                f"{self.share_dir}/{package}/classpath.env",
+                f"{self.share_dir}/java/packages/{package}",
+            ):
+                try:
+                    self.__envs[package] = parse_env(path)
+                    break
+                except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+                    continue
+        return self.__envs[package]
+
+    def classpath(self, package: str, deps: bool = True) -> Classpath:
+        """The jars of `package`, and with `deps` of all the packages it
+        depends on, without repeated jars. Raises a KeyError if it isn't
+        installed."""
+        env = self.env(package)
+        if env is None:
+            raise KeyError(package)
+        if not deps:
+            return self.__to_classpath(_split(env.get("CLASSPATH", "")))
+        jars, _ = self.__resolve(package, {})
+        return self.__to_classpath(jars)
+
+    def __resolve(
+        self, package: str, pending: dict[str, int]
+    ) -> tuple[tuple[str, ...], int]:
+        """The jars of `package` and its dependencies, and the position in
+        `pending` of the first package of a cycle it is in
+
+        `pending` has the packages that are being resolved, and those that
+        are in a cycle with one of them, in the order they were reached.
+        """
+        closure = self.__closures.get(package)
+        if closure is not None:
+            return closure, len(pending)
+        if package in pending:
+            return (), pending[package]
+
+        position = pending[package] = len(pending)
+        low = position
+        env = self.env(package) or {}
+        jars = _split(env.get("CLASSPATH", ""))
+        for dep in _split(env.get("DEPEND", "")):
+            jar, _, dep = dep.rpartition("@")
+            if jar:
+                dep_env = self.env(dep) or {}
+                jars += (
+                    path
+                    for path in _split(dep_env.get("CLASSPATH", ""))
+                    if os.path.basename(path) == jar
+                )
+                continue
+            dep_jars, dep_low = self.__resolve(dep, pending)
+            jars += dep_jars
+            low = min(low, dep_low)
+        closure = tuple(dict.fromkeys(jars))
+
+        # The first package of a cycle has the jars of all of them, which
+        # the others then have after their own
+        if low == position:
+            for member in list(pending)[position:]:
+                del pending[member]
+                if member != package:
+                    own_jars = _split((self.env(member) or {}).get("CLASSPATH", ""))
+                    self.__closures[member] = tuple(
+                        dict.fromkeys([*own_jars, *closure])
+                    )
+            self.__closures[package] = closure
+        return closure, low
+
+    @staticmethod
+    def __to_classpath(jars: T.Iterable[str]) -> Classpath:
+        classpath = Classpath()
+        classpath.classpath = list(dict.fromkeys(jars))
+        return classpath
+
+
+def _split(value: str) -> list[str]:
+    return [item for item in value.split(":") if item]
@@ -30,23 +30,25 @@ class ManifestParser(parser.Parser):
                 if attrib == "":
                     raise ParseError("Malformed line " + str(lineno))
 
-                value += x.strip()
+                # Only the one space is taken away, the others can be part
+                # of the value like between the entries of a Class-Path
+                value += x[1:].rstrip("\r\n")
                 continue
 
             xs = x.split(": ", 2)
 
             if len(xs) > 1:
                 if attrib != "":
-                    root.add_kid(Node(attrib, value))
+                    root.add_kid(Node(attrib, value.strip()))
 
                 attrib = xs[0]
-                value = xs[1].strip()
+                value = xs[1].rstrip("\r\n")
 
             else:
                 raise ParseError("Malformed line " + str(lineno))
 
         if attrib != "":
-            root.add_kid(Node(attrib, value))
+            root.add_kid(Node(attrib, value.strip()))
 
         return root
 
@@ -0,0 +1,168 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""A persistent cache of what class-version-verify.py read from jars"""
+
+from zipfile import BadZipFile
+from .cvv import JarScan
+from .ziputil import open_archive
+import json
+import os
+import sqlite3
+import time
+import typing as T
+import zlib
+
+
+class ScanCache:
+    """Cache the JarScan of jars in the sqlite database at `path`
+
+    An entry is used as long as the (device, inode, size, mtime_ns) of its jar
+    didn't change. When they did, the digest of the jar's central directory
+    is compared instead, so a jar that was rebuilt or reinstalled without
+    changes still doesn't need to be read again.
+
+    sqlite takes care of the locking, so parallel ebuild jobs can share a
+    cache. Every write is its own short transaction, and when the database
+    is locked for more than `timeout` seconds the jar is read as if it
+    wasn't cached. Once the cached scans take more than `max_size` bytes,
+    the least recently used entries are evicted when the cache is closed.
+    """
+
+    # Write when hits were used this many times, instead of on every hit
+    flush_interval = 256
+
+    def __init__(
+        self, path: str, max_size: int = 256 * 1024 * 1024, timeout: float = 60
+    ) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Path -> when it was last used, not written yet
+        self.__used: dict[str, int] = {}
+        self.__db = sqlite3.connect(path, timeout=timeout)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute(
+            """CREATE TABLE IF NOT EXISTS jars (
+                path TEXT PRIMARY KEY,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest BLOB NOT NULL,
+                scan BLOB NOT NULL,
+                last_used INTEGER NOT NULL
+            )"""
+        )
+        self.__db.execute(
+            "CREATE INDEX IF NOT EXISTS jars_last_used ON jars (last_used)"
+        )
+        self.__db.commit()
+
+    def __enter__(self) -> "ScanCache":
+        return self
+
+    def __exit__(self, *exc_info: T.Any) -> None:
+        self.close()
+
+    def lookup(self, path: str) -> tuple[os.stat_result, JarScan | None]:
+        """Get the cached scan of the jar at `path`
+
+        Returns the stat result of the jar, to store() it with if it has to
+        be read, and the scan or None if it isn't cached.
+        """
+        st = os.stat(path)
+        try:
+            row = self.__db.execute(
+                "SELECT dev, ino, size, mtime_ns, digest, scan FROM jars"
+                " WHERE path = ?",
+                (path,),
+            ).fetchone()
+        except sqlite3.OperationalError:
+            self.misses += 1
+            return st, None
+
+        if row is not None and tuple(row[:4]) != self.__identity(st):
+            try:
+                with open_archive(path) as jar:
+                    digest = jar.digest()
+            except (OSError, BadZipFile):
+                digest = None
+            if digest != row[4]:
+                row = None
+            else:
+                self.__change(
+                    "UPDATE jars SET dev = ?, ino = ?, size = ?, mtime_ns = ?"
+                    " WHERE path = ?",
+                    (*self.__identity(st), path),
+                )
+
+        if row is None:
+            self.misses += 1
+            return st, None
+
+        self.hits += 1
+        self.__used[path] = time.time_ns()
+        if len(self.__used) >= self.flush_interval:
+            self.__flush()
+        scan = JarScan.from_json(json.loads(zlib.decompress(row[5])))
+        scan.digest = row[4]
+        return st, scan
+
+    def store(self, path: str, st: os.stat_result, scan: JarScan) -> None:
+        """Cache the scan of the jar at `path`, which had the stat result `st`
+        before it was read"""
+        assert scan.digest is not None
+        data = zlib.compress(json.dumps(scan.to_json()).encode("utf-8"))
+        self.__change(
+            "INSERT OR REPLACE INTO jars VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, *self.__identity(st), scan.digest, data, time.time_ns()),
+        )
+
+    def close(self) -> None:
+        """Write out when the entries were used, then evict those over the
+        size limit"""
+        self.__flush()
+        try:
+            total = self.__db.execute(
+                "SELECT COALESCE(SUM(LENGTH(scan)), 0) FROM jars"
+            ).fetchone()[0]
+            if total > self.max_size:
+                evicted = []
+                for path, size in self.__db.execute(
+                    "SELECT path, LENGTH(scan) FROM jars ORDER BY last_used"
+                ):
+                    if total <= self.max_size:
+                        break
+                    total -= size
+                    evicted.append((path,))
+                with self.__db:
+                    self.__db.executemany("DELETE FROM jars WHERE path = ?", evicted)
+        except sqlite3.OperationalError:
+            # Another process can evict them later
+            pass
+        self.__db.close()
+
+    def __flush(self) -> None:
+        used = [(last_used, path) for path, last_used in self.__used.items()]
+        self.__used.clear()
+        try:
+            with self.__db:
+                self.__db.executemany(
+                    "UPDATE jars SET last_used = ? WHERE path = ?", used
+                )
+        except sqlite3.OperationalError:
+            pass
+
+    def __change(self, sql: str, parameters: tuple[T.Any, ...]) -> None:
+        """Run a single write in its own transaction, it is skipped if the
+        database stays locked"""
+        try:
+            with self.__db:
+                self.__db.execute(sql, parameters)
+        except sqlite3.OperationalError:
+            pass
+
+    @staticmethod
+    def __identity(st: os.stat_result) -> tuple[int, int, int, int]:
+        return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
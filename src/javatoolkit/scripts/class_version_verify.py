@@ -3,10 +3,17 @@
 # Copyright(c) 2005, Gentoo Foundation
 # Distributed under the terms of the GNU General Public Licence v2
 
+import itertools
+import json
 import os
 import sys
+import typing as T
 from optparse import OptionParser, make_option
 from .. import cvv
+from ..daemon import DaemonClient
+from ..histogram import VersionHistogram
+from ..scancache import ScanCache
+from ..targetpolicy import TargetPolicy
 
 
 def main() -> None:
@@ -50,10 +57,83 @@ def main() -> None:
             default=False,
             help="Only output the files",
         ),
+        make_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=1,
+            help="Number of processes to check files with, 0 for one per CPU",
+        ),
+        make_option(
+            "--cache",
+            type="string",
+            dest="cache",
+            help="Remember what was read from jars in this file for later runs",
+        ),
+        make_option(
+            "--daemon",
+            action="store_true",
+            dest="daemon",
+            default=False,
+            help="Ask javatoolkit-daemon for the jars if it is running, only"
+            " with one job",
+        ),
+        make_option(
+            "--max-bad",
+            type="int",
+            dest="max_bad",
+            default=0,
+            help="Stop after finding this many bad files",
+        ),
+        make_option(
+            "--fail-fast",
+            action="store_const",
+            dest="max_bad",
+            const=1,
+            help="Stop after finding the first bad file",
+        ),
+        make_option(
+            "--policy",
+            type="string",
+            dest="policy",
+            help="File with glob patterns of paths and their target versions",
+        ),
+        make_option(
+            "--sample",
+            type="int",
+            dest="sample",
+            default=0,
+            help="Only read this many random classes of each jar and of each of its"
+            " multi-release dirs, and all of them if one of those is bad",
+        ),
+        make_option(
+            "--histogram",
+            type="choice",
+            choices=["table", "json"],
+            dest="histogram",
+            help="Instead of listing files, count the classes of each version in"
+            " every archive, as a table or as json",
+        ),
+        make_option(
+            "--files-from",
+            type="string",
+            dest="files_from",
+            help="Also check the files listed in this file, - for stdin",
+        ),
+        make_option(
+            "-0",
+            "--null",
+            action="store_true",
+            dest="null",
+            default=False,
+            help="Files in --files-from are separated by NUL, as from find -print0",
+        ),
     ]
 
     parser = OptionParser(
-        "%prog -t version [-r] [-v] [-s] <class/jar files or dir>", options_list
+        "%prog -t version [options] <class/jar/binpkg files or dirs>",
+        options_list,
     )
     (options, args) = parser.parse_args()
 
@@ -61,53 +141,133 @@ def main() -> None:
         print("-t is mandatory")
         sys.exit(2)
 
-    cvv_magic = cvv.CVVMagic(options.version)
-
-    for arg in args:
-        if os.path.isfile(arg):
-            cvv_magic.do(arg)
-
-        if options.deep and os.path.isdir(arg):
-            for root, dirs, files in os.walk(arg):
-                for filename in files:
-                    cvv_magic.do("%s/%s" % (root, filename))
-
-    if options.file_only:
-        lst = set()
-        for info in cvv_magic.bad:
-            match info.loc:
-                case cvv.FileLoc(path) | cvv.JarLoc(cvv.FileLoc(path), _):
-                    lst.add(path)
-        for i in lst:
-            print(i)
-    else:
-        if options.verbose:
-            for good in cvv_magic.good:
-                print(__format_good(good))
+    policy = None
+    if options.policy:
+        try:
+            policy = TargetPolicy.load(options.policy)
+        except (OSError, ValueError) as e:
+            print(e)
+            sys.exit(2)
+
+    histogram = VersionHistogram(args) if options.histogram else None
+    cache: ScanCache | DaemonClient | None = None
+    jobs = options.jobs if options.jobs > 0 else os.cpu_count() or 1
+    if options.cache:
+        cache = ScanCache(options.cache)
+    elif options.daemon and jobs == 1:
+        # Its answers come one after another, more jobs read jars faster
+        cache = DaemonClient.connect()
+    cvv_magic = cvv.CVVMagic(
+        options.version,
+        cache,
+        policy=policy,
+        sample=options.sample,
+        histogram=histogram,
+    )
+
+    paths: T.Iterable[str] = args
+    if options.files_from:
+        paths = itertools.chain(
+            args, __read_files_from(options.files_from, options.null)
+        )
+    files = cvv.CVVMagic.find_files(paths, options.deep)
+    results = cvv_magic.iter_many(
+        files,
+        jobs,
+        good=options.verbose and histogram is None,
+        links_skipped=True,
+    )
+
+    # -f prints each file with a bad class once
+    seen_files = set()
+    bad_count = 0
+    for status, result in results:
+        if histogram is not None:
+            # Only the counts get printed, at the end
+            pass
+        elif options.file_only:
+            match status, result.loc:
+                case "bad", cvv.FileLoc(path) | cvv.JarLoc(file=cvv.FileLoc(path)):
+                    if path not in seen_files:
+                        seen_files.add(path)
+                        print(path)
+        elif status == "good":
+            print(__format_good(result))
+        elif not options.silent:
+            if status == "bad":
+                print(__format_bad(result))
+            else:
+                print(__format_skipped(result))
+
+        if status == "bad":
+            bad_count += 1
+            if bad_count == options.max_bad:
+                results.close()
+                break
 
-        if not options.silent:
-            for bad in cvv_magic.bad:
-                print(__format_bad(bad))
-            for skipped in cvv_magic.skipped:
-                print(__format_skipped(skipped))
+    if cache is not None:
+        cache.close()
 
+    if histogram is not None:
+        if options.histogram == "json":
+            json.dump(histogram.to_json(), sys.stdout, indent=1)
+            print()
+        else:
+            for line in histogram.format_table():
+                print(line)
+            print()
+
+    if not options.file_only and options.histogram != "json":
         print(f"CVV: {options.version}")
         print(__get_total_line(cvv_magic))
+        if cvv_magic.sampled_count:
+            print(__get_sampled_line(cvv_magic))
+        if options.verbose and isinstance(cache, ScanCache):
+            print(f"Cache hits: {cache.hits} misses: {cache.misses}")
 
-    if len(cvv_magic.bad) > 0:
+    if cvv_magic.bad_count > 0:
         sys.exit(1)
     else:
         sys.exit(0)
 
 
+def __read_files_from(path: str, null: bool) -> T.Iterator[str]:
+    with open(
+        sys.stdin.fileno() if path == "-" else path, "rb", closefd=path != "-"
+    ) as f:
+        if not null:
+            for line in f:
+                if line := line.rstrip(b"\n"):
+                    yield os.fsdecode(line)
+            return
+
+        rest = b""
+        while chunk := f.read(64 * 1024):
+            *names, rest = (rest + chunk).split(b"\0")
+            for name in names:
+                if name:
+                    yield os.fsdecode(name)
+        if rest:
+            yield os.fsdecode(rest)
+
+
 def __get_total_line(cvv_magic: cvv.CVVMagic) -> str:
-    good = len(cvv_magic.good)
-    bad = len(cvv_magic.bad)
-    skipped = len(cvv_magic.skipped)
+    good = cvv_magic.good_count
+    bad = cvv_magic.bad_count
+    skipped = cvv_magic.skipped_count
     total = good + bad + skipped
     return f"Checked: {total} Good: {good} Bad: {bad} Skipped: {skipped}"
 
 
+def __get_sampled_line(cvv_magic: cvv.CVVMagic) -> str:
+    read = cvv_magic.sampled_read
+    total = read + cvv_magic.sampled_unread
+    return (
+        f"Sampled: {cvv_magic.sampled_count} archives, only {read} of their"
+        f" {total} classes were read"
+    )
+
+
 def __format_class(cf: cvv.ClassFile) -> str:
     return f"{__format_loc(cf.loc)} version {cf.encoded_version} (expected {cf.expected_version})"
 
@@ -132,11 +292,12 @@ def __format_good(f: cvv.GoodFile) -> str:
 
 
 def __format_loc(loc: cvv.Loc) -> str:
+    """Like outer.war!/WEB-INF/lib/x.jar!/a/B.class"""
     match loc:
         case cvv.FileLoc(path):
-            return f"{path}"
+            return path
         case cvv.JarLoc(jar, member):
-            return f"{jar.path}({member})"
+            return f"{__format_loc(jar)}!/{member}"
 
 
 if __name__ == "__main__":
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+import sys
+from optparse import OptionParser, make_option
+from ..classpath import Classpath
+
+
+def main() -> None:
+    options_list = [
+        make_option(
+            "-j",
+            "--jobs",
+            type="int",
+            dest="jobs",
+            default=8,
+            help="number of threads to check the entries with",
+        ),
+    ]
+
+    parser = OptionParser("%prog [-j jobs] classpath ... | -", options_list)
+    (options, args) = parser.parse_args()
+    if not args:
+        parser.error("A classpath is needed")
+    # A - reads classpaths from stdin, one per line
+    classpaths = [
+        line.strip() for arg in args for line in (sys.stdin if arg == "-" else [arg])
+    ]
+
+    ok = True
+    for classpath in classpaths:
+        for problem in Classpath(classpath).validate(options.jobs):
+            ok = False
+            if problem.detail is not None:
+                print(f"{problem.entry}: {problem.kind}: {problem.detail}")
+            else:
+                print(f"{problem.entry}: {problem.kind}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
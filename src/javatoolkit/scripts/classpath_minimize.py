@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+from optparse import OptionParser, make_option
+from ..classdeps import ClasspathMinimizer
+from ..classpath import Classpath
+
+
+def main() -> None:
+    options_list = [
+        make_option(
+            "-c",
+            "--classpath",
+            type="string",
+            dest="classpath",
+            help="the classpath to minimize, separated by :",
+        ),
+        make_option(
+            "-r",
+            "--root",
+            action="append",
+            dest="roots",
+            default=[],
+            help="a jar or directory whose classes are all needed, can be"
+            " given more than once",
+        ),
+    ]
+
+    parser = OptionParser(
+        "%prog -c classpath [-r root.jar] [class.Name ...]", options_list
+    )
+    (options, args) = parser.parse_args()
+    if options.classpath is None:
+        parser.error("A classpath is needed")
+    if not args and not options.roots:
+        parser.error("Either root classes or --root jars are needed")
+
+    with ClasspathMinimizer(Classpath(options.classpath)) as minimizer:
+        print(minimizer.minimize(args, options.roots))
+
+
+if __name__ == "__main__":
+    main()
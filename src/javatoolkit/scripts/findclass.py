@@ -10,13 +10,21 @@
 # Licensed under the GNU General Public License, v2.
 #
 
-import os
 import re
 import sys
-import glob
+import json
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import BadZipFile
 from optparse import OptionParser
 from subprocess import getstatusoutput
-from java_config.jc_util import find_exec, collect_packages
+from java_config.jc_util import find_exec
+from ..classindex import ClassIndex, index_path
+from ..conflicts import ConflictFinder, read_classes
+from ..daemon import DaemonClient, DaemonError
+from ..packageenv import PackageResolver
+from ..ziputil import open_archive
 
 
 __author__ = (
@@ -48,9 +56,82 @@ def parse_args():
         dest="verbose",
         help="generate verbose output",
     )
+    parser.add_option(
+        "--jar-tool",
+        action="store_true",
+        dest="jar_tool",
+        help="list jars with the jar tool of the JDK instead of reading them",
+    )
+    parser.add_option(
+        "-j",
+        "--jobs",
+        type="int",
+        dest="jobs",
+        default=1,
+        help="number of threads to read packages and jars with",
+    )
+    parser.add_option(
+        "--daemon",
+        action="store_true",
+        dest="daemon",
+        help="without the index, ask javatoolkit-daemon for the contents of"
+        " jars if it is running",
+    )
+    parser.add_option(
+        "--index",
+        action="store_true",
+        dest="index",
+        default=True,
+        help="look names up in an index of the installed jars (default)",
+    )
+    parser.add_option(
+        "--no-index",
+        action="store_false",
+        dest="index",
+        help="search through every installed jar",
+    )
+    parser.add_option(
+        "--rebuild-index",
+        action="store_true",
+        dest="rebuild_index",
+        help="read all jars into the index again",
+    )
+    parser.add_option(
+        "--batch",
+        dest="batch",
+        metavar="FILE",
+        help="also look up the names in FILE, one per line, or - for stdin,"
+        " and print which jars each one is in",
+    )
+    parser.add_option(
+        "--format",
+        type="choice",
+        choices=["tsv", "json"],
+        dest="format",
+        default="tsv",
+        help="how to print the jars of each name in batch mode, or the"
+        " conflicts, tsv or json",
+    )
+    parser.add_option(
+        "--conflicts",
+        action="store_true",
+        dest="conflicts",
+        help="list the classes that are in more than one jar and the packages"
+        " split across jars",
+    )
+    parser.add_option(
+        "--classpath",
+        dest="classpath",
+        help="look for conflicts only between the jars of this classpath",
+    )
     opt, files = parser.parse_args()
 
-    if len(files) < 1:
+    if opt.batch:
+        try:
+            files.extend(read_batch(opt.batch))
+        except OSError as e:
+            parser.error("Can't read %s: %s" % (opt.batch, e))
+    elif len(files) < 1 and not (opt.rebuild_index or opt.conflicts):
         parser.error("Must supply at least one class or package name")
 
     return opt, files
@@ -59,38 +140,199 @@ def parse_args():
 def main():
     opt, files = parse_args()
 
-    jarcmd = find_exec("jar")
+    jarcmd = find_exec("jar") if opt.jar_tool else None
+
+    if opt.conflicts:
+        with ThreadPoolExecutor(max(opt.jobs, 1)) as pool:
+            find_conflicts(opt, pool)
+        return
 
-    javapaths = [f.replace(".", "/") for f in files]
+    # The names in the order they were given, without the repeated ones
+    names = list(dict.fromkeys(files))
+    javapaths = [f.replace(".", "/") for f in names]
     matchers = [re.compile(p) for p in javapaths]
+    matches = {name: [] for name in names}
 
-    for pkg in get_all_packages():
+    def found(i, pkg, jar):
+        if opt.batch:
+            matches[names[i]].append((pkg, jar))
+            return
         if opt.verbose:
-            print("Searching package %s" % pkg)
-        for jar in collect_packages(pkg).split(":"):
+            print("Found in %s" % pkg, end=" ")
+        print(jar, flush=True)
+
+    with ThreadPoolExecutor(max(opt.jobs, 1)) as pool:
+        if (opt.index or opt.rebuild_index) and not opt.jar_tool:
+            # Search through the jars instead if the index can't be used,
+            # like when another findclass keeps it locked for too long
+            try:
+                with ClassIndex(index_path()) as index:
+                    results = find_in_index(index, javapaths, opt)
+            except (OSError, sqlite3.Error) as e:
+                if opt.verbose:
+                    print("Can't use the index: %s" % e)
+            else:
+                for i, pkg, jar in results:
+                    found(i, pkg, jar)
+                if opt.batch:
+                    print_matches(matches, opt.format)
+                return
+
+        client = DaemonClient.connect() if opt.daemon else None
+
+        def list_one(pkg_jar):
+            if jarcmd is not None:
+                return getstatusoutput("%s tvf %s" % (jarcmd, pkg_jar[1]))[1]
+            return list_jar(pkg_jar[1], client)
+
+        last_pkg = None
+        jars = installed_jars()
+        for (pkg, jar), out in ordered_map(pool, list_one, jars, opt.jobs):
             if opt.verbose:
+                if pkg != last_pkg:
+                    print("Searching package %s" % pkg)
+                    last_pkg = pkg
                 print("Searching jar %s" % jar)
-            status, out = getstatusoutput("%s tvf %s" % (jarcmd, jar))
-            for m in matchers:
+            if out is None:
+                if opt.verbose:
+                    print("Can't read jar %s" % jar)
+                continue
+            for i, m in enumerate(matchers):
                 if m.search(out):
-                    if opt.verbose:
-                        print("Found in %s" % pkg, end=" ")
-                    print(jar)
+                    found(i, pkg, jar)
 
+    if opt.batch:
+        print_matches(matches, opt.format)
 
-def get_all_packages():
-    pkg = glob.glob("/usr/share/*/package.env")
-    pkg = [os.path.basename(os.path.dirname(i)) for i in pkg]
 
-    classpath = glob.glob("/usr/share/*/classpath.env")
-    classpath = [os.path.basename(os.path.dirname(i)) for i in classpath]
+def find_in_index(index, javapaths, opt):
+    """The (index of the name, package, jar) of every match of `javapaths`,
+    after bringing `index` up to date"""
+    jars = installed_jars()
+    read, dropped = index.refresh(jars, opt.rebuild_index, opt.jobs)
+    if opt.verbose:
+        print("Indexed %d jars, dropped %d" % (read, dropped))
+
+    return [
+        (i, pkg, jar)
+        for i, path in enumerate(javapaths)
+        for pkg, jar in index.lookup(path)
+    ]
+
+
+def find_conflicts(opt, pool):
+    if opt.classpath:
+        jars = [(None, jar) for jar in dict.fromkeys(opt.classpath.split(":")) if jar]
+    else:
+        jars = installed_jars()
+
+    finder = ConflictFinder()
+    for (pkg, jar), classes in ordered_map(
+        pool, lambda pkg_jar: read_classes(pkg_jar[1]), jars, opt.jobs
+    ):
+        if classes is None:
+            if opt.verbose:
+                print("Can't read jar %s" % jar)
+            continue
+        finder.add_jar(jar, classes)
+
+    conflicts = finder.conflicts()
+    if opt.format == "json":
+        json.dump(
+            [{"kind": c.kind, "name": c.name, "jars": c.jars} for c in conflicts],
+            sys.stdout,
+            indent=2,
+        )
+        print()
+        return
+    for c in conflicts:
+        print("\t".join([c.kind, c.name] + c.jars))
 
-    dir = glob.glob("/usr/share/java/packages/*")
-    dir = [os.path.basename(i) for i in dir]
 
-    pkg.extend(classpath)
-    pkg.extend(dir)
-    return pkg
+def read_batch(filename):
+    """The names in `filename`, or stdin for -, without empty lines and
+    comments"""
+    if filename == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(filename) as f:
+            lines = f.readlines()
+    names = [line.split("#", 1)[0].strip() for line in lines]
+    return [name for name in names if name]
+
+
+def print_matches(matches, format):
+    """Print the (package, jar) pairs found for each name, as a line per
+    pair with the name, package and jar separated by tabs, or as a JSON
+    object with a list of them for each name"""
+    if format == "json":
+        json.dump(
+            {
+                name: [{"package": pkg, "jar": jar} for pkg, jar in found]
+                for name, found in matches.items()
+            },
+            sys.stdout,
+            indent=2,
+        )
+        print()
+        return
+    for name, found in matches.items():
+        for pkg, jar in found:
+            print("%s\t%s\t%s" % (name, pkg, jar))
+
+
+def installed_jars():
+    """The (package, jar) of every jar of the installed packages and their
+    dependencies, in the order of PackageResolver.packages()
+
+    Each jar comes with the package that has it in its own classpath, the
+    jars that are only reached through dependencies come after those. A jar
+    in several packages comes only with the first one."""
+    resolver = PackageResolver()
+    packages = resolver.packages()
+    seen = set()
+    for deps in False, True:
+        for pkg in packages:
+            try:
+                classpath = resolver.classpath(pkg, deps=deps)
+            except KeyError:
+                continue
+            for jar in classpath.classpath:
+                if jar not in seen:
+                    seen.add(jar)
+                    yield pkg, jar
+
+
+def ordered_map(pool, func, items, jobs):
+    """Yield each of `items` with func(item), which are run on `pool`
+
+    The results come in the order of `items`, each as soon as it and those
+    before it are done. Only a few calls per job are running ahead.
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(func, item)))
+        if len(pending) >= jobs * 4:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+
+def list_jar(jar, client=None):
+    """The names of the members of `jar`, one per line, or None if it can't
+    be read"""
+    if client is not None:
+        try:
+            return "\n".join(client.names(jar))
+        except DaemonError:
+            pass
+    try:
+        with open_archive(jar) as archive:
+            return "\n".join(archive.name(i) for i in range(len(archive)))
+    except (OSError, BadZipFile):
+        return None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+import os
+import signal
+import sys
+from optparse import OptionParser, make_option
+from ..daemon import DaemonClient, JarDaemon, make_private_dir, socket_path
+
+
+def main() -> None:
+    options_list = [
+        make_option(
+            "--socket",
+            type="string",
+            dest="socket",
+            help="Unix socket to listen on, instead of $JAVATOOLKIT_DAEMON_SOCKET"
+            " or one in $XDG_RUNTIME_DIR",
+        ),
+        make_option(
+            "--max-entries",
+            type="int",
+            dest="max_entries",
+            default=4096,
+            help="How many archives to keep in memory",
+        ),
+    ]
+
+    parser = OptionParser("%prog [--socket path]", options_list)
+    (options, args) = parser.parse_args()
+    path = options.socket or socket_path()
+    if not options.socket and not os.environ.get("JAVATOOLKIT_DAEMON_SOCKET"):
+        # Nobody else can put a socket there that looks like this one
+        try:
+            make_private_dir(os.path.dirname(path))
+        except OSError as e:
+            print(e)
+            sys.exit(1)
+
+    if os.path.exists(path):
+        client = DaemonClient.connect(path)
+        if client is not None:
+            client.close()
+            print(f"Already running on {path}")
+            sys.exit(1)
+        # Left behind by one that didn't exit cleanly
+        os.unlink(path)
+
+    server = JarDaemon(path, options.max_entries)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
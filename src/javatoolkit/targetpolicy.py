@@ -0,0 +1,86 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""Per-path target versions for class-version-verify.py"""
+
+from .cvv import FileLoc, JarLoc, Loc, parse_version
+import re
+import typing as T
+
+
+class TargetPolicy:
+    """Map the files that get checked to the versions they target
+
+    Each rule is a glob pattern and a target version. Patterns are matched
+    against file paths, and with a "!/" against the members of archives,
+    like "lib/tools.jar!/com/sun" or "**/plugins/*.jar!/**/impl". In them
+    "*" and "?" don't match a "/", "**" matches anything and "**/" any
+    number of directories. A pattern without a leading "/" can match from
+    any directory on.
+
+    A rule applies to what its pattern matches and to everything inside of
+    that, be it a directory or an archive. The first rule that applies
+    wins. All the patterns are compiled into a single regular expression,
+    so a lookup is one match however many rules there are.
+    """
+
+    def __init__(self, rules: T.Iterable[tuple[str, int]]) -> None:
+        self.rules = list(rules)
+        # Whether any rule looks into archives, so that not every member
+        # has to be looked up
+        self.has_member_rules = any("!/" in p for p, _ in self.rules)
+        self.__regex = re.compile(
+            "|".join(
+                f"(?P<r{i}>{self.__translate(pattern)})"
+                for i, (pattern, _) in enumerate(self.rules)
+            )
+            or "(?!)",
+            re.DOTALL,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "TargetPolicy":
+        """Read the rules from the file at `path`
+
+        Each line has a pattern and a version, separated by whitespace.
+        Empty lines and those starting with a "#" are ignored.
+        """
+        rules = []
+        with open(path, encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    pattern, version = line.rsplit(None, 1)
+                    rules.append((pattern, parse_version(version)))
+                except ValueError:
+                    raise ValueError(
+                        f"{path}:{lineno}: expected a pattern and a version: {line}"
+                    ) from None
+        return cls(rules)
+
+    def lookup(self, loc: Loc) -> int | None:
+        """The target version for `loc`, or None if no rule applies"""
+        match = self.__regex.fullmatch(self.__key(loc))
+        if match is None:
+            return None
+        return self.rules[int(T.cast(str, match.lastgroup)[1:])][1]
+
+    @classmethod
+    def __key(cls, loc: Loc) -> str:
+        match loc:
+            case FileLoc(path):
+                return path
+            case JarLoc(jar, member):
+                return f"{cls.__key(jar)}!/{member}"
+
+    @staticmethod
+    def __translate(pattern: str) -> str:
+        regex = [] if pattern.startswith("/") else ["(?:.*/)?"]
+        wildcards = {"**/": "(?:.*/)?", "**": ".*", "*": "[^/]*", "?": "[^/]"}
+        for i, part in enumerate(re.split(r"(\*\*/|\*\*|\*|\?)", pattern)):
+            regex.append(re.escape(part) if i % 2 == 0 else wildcards[part])
+        # Everything in the matched directory or archive too
+        regex.append("(?:!?/.*)?")
+        return "".join(regex)
@@ -0,0 +1,611 @@
+# Copyright 2026 Gentoo Authors
+# Distributed under the terms of the GNU General Public License v2
+
+"""Low level helpers for reading zip (and thus jar) archives"""
+
+from array import array
+from contextlib import contextmanager
+from struct import Struct, error as StructError, unpack_from
+from zipfile import BadZipFile, ZipFile, ZipInfo, ZIP_STORED, ZIP_DEFLATED
+import hashlib
+import io
+import mmap
+import shutil
+import tempfile
+import typing as T
+import zlib
+
+
+# signature, versions, flags, method, time, date, crc, sizes, name and extra length
+LOCAL_HEADER = Struct("<4s2B4HL2L2H")
+LOCAL_HEADER_SIGNATURE = b"PK\003\004"
+
+# signature, versions, flags, method, time, date, crc, sizes, name, extra and
+# comment length, disk, attributes, local header offset
+CENTRAL_HEADER = Struct("<4s4B4HL2L5H2L")
+CENTRAL_HEADER_SIGNATURE = b"PK\001\002"
+
+# signature, disks, entries on this disk, entries, size, offset, comment length
+END_RECORD = Struct("<4s4H2LH")
+END_RECORD_SIGNATURE = b"PK\005\006"
+# signature, disk, offset of the zip64 end record, disks
+ZIP64_END_LOCATOR = Struct("<4sLQL")
+ZIP64_END_LOCATOR_SIGNATURE = b"PK\006\007"
+# signature, record size, versions, disks, entries on this disk, entries,
+# size, offset
+ZIP64_END_RECORD = Struct("<4sQ2H2L4Q")
+ZIP64_END_RECORD_SIGNATURE = b"PK\006\006"
+
+# The header in front of the archive in a JMOD file
+JMOD_HEADER = b"JM\x01\x00"
+
+_EXTRA_HEADER = Struct("<2H")
+_ZIP64_EXTRA = 0x0001
+_ENCRYPTED = 0x1
+_UTF8_NAME = 0x800
+
+# The part of each central directory entry that goes into its digest
+_DIGEST_ENTRY = Struct("<LQ")
+
+# How much data to inflate at once when a member is copied to a file
+_COPY_CHUNK = 1024 * 1024
+
+# How much compressed data to read at once when inflating the start of a
+# member. A dynamic huffman block starts with its code tables, so a few
+# hundred bytes can be needed before the first decompressed byte.
+_INFLATE_READ = 512
+
+
+def read_member_head(fp: T.IO[bytes], info: ZipInfo, size: int) -> bytes | None:
+    """Read the first `size` bytes of the member described by `info`
+
+    This reads the member's local header straight from `fp`, the file of the
+    archive, and inflates only as much of its data as needed. It is far
+    cheaper than ZipFile.open() when only the start of many members is of
+    interest. The position of `fp` is kept.
+
+    Returns None for members that this can't handle, like encrypted members
+    or compression methods other than stored and deflated. Use
+    ZipFile.open() for those.
+    """
+    if info.flag_bits & _ENCRYPTED or info.compress_type not in (
+        ZIP_STORED,
+        ZIP_DEFLATED,
+    ):
+        return None
+
+    pos = fp.tell()
+    try:
+        # Read the header and, usually, all the data needed in one go
+        fp.seek(info.header_offset)
+        buf = fp.read(LOCAL_HEADER.size + _INFLATE_READ)
+        if len(buf) < LOCAL_HEADER.size:
+            return None
+        fields = LOCAL_HEADER.unpack_from(buf)
+        if fields[0] != LOCAL_HEADER_SIGNATURE:
+            return None
+        start = LOCAL_HEADER.size + fields[-2] + fields[-1]
+        data = buf[start : start + info.compress_size]
+        if start > len(buf):
+            fp.seek(start - len(buf), 1)
+
+        if info.compress_type == ZIP_STORED:
+            if len(data) < size:
+                data += fp.read(min(size, info.compress_size) - len(data))
+            return data[:size]
+
+        inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+        result = b""
+        remaining = info.compress_size - len(data)
+        while True:
+            result += inflater.decompress(data, size - len(result))
+            if len(result) >= size or remaining <= 0 or inflater.eof:
+                return result
+            data = fp.read(min(_INFLATE_READ, remaining))
+            if not data:
+                return result
+            remaining -= len(data)
+    except zlib.error:
+        return None
+    finally:
+        fp.seek(pos)
+
+
+class FileWindow(io.RawIOBase):
+    """A read only file over a memoryview, like a whole mmap()ed archive or
+    a stored member inside of it, that doesn't copy more than is read
+
+    Closing it releases the view.
+    """
+
+    def __init__(self, view: memoryview) -> None:
+        super().__init__()
+        self.__view = view
+        self.__pos = 0
+
+    def window(self, offset: int, size: int) -> "FileWindow":
+        """A new file over `size` bytes of this one, starting at `offset`"""
+        return FileWindow(self.__view[offset : offset + size])
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.__pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        match whence:
+            case io.SEEK_SET:
+                pos = offset
+            case io.SEEK_CUR:
+                pos = self.__pos + offset
+            case io.SEEK_END:
+                pos = len(self.__view) + offset
+            case _:
+                raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError(f"Negative seek position: {pos}")
+        self.__pos = pos
+        return pos
+
+    def read(self, size: int | None = -1) -> bytes:
+        start = min(self.__pos, len(self.__view))
+        end = len(self.__view) if size is None or size < 0 else start + size
+        data = self.__view[start:end].tobytes()
+        self.__pos = start + len(data)
+        return data
+
+    def readinto(self, buffer: T.Any) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.__view.release()
+        super().close()
+
+
+class ArchiveDirectory:
+    """The members of a zip archive, by their index in its central directory
+
+    This is the interface CVVMagic reads archives through, see
+    CentralDirectory and ZipDirectory.
+    """
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def name(self, index: int) -> str:
+        raise NotImplementedError
+
+    def endswith(self, index: int, suffix: bytes | tuple[bytes, ...]) -> bool:
+        """Whether the raw name of a member ends with `suffix`, without
+        decoding it"""
+        raise NotImplementedError
+
+    def index(self, name: str) -> int | None:
+        """The index of the member called `name`, None if there is none"""
+        raise NotImplementedError
+
+    def crc(self, index: int) -> int:
+        """The CRC32 of a member, as the central directory has it"""
+        raise NotImplementedError
+
+    def read(self, index: int) -> bytes:
+        raise NotImplementedError
+
+    def read_head(self, index: int, size: int) -> bytes:
+        """The first `size` bytes of a member, or less if it is shorter"""
+        raise NotImplementedError
+
+    def open_nested(self, index: int) -> T.ContextManager["ArchiveDirectory"]:
+        """Open a member that is an archive itself"""
+        raise NotImplementedError
+
+    def digest(self) -> bytes:
+        """A digest of the names, CRCs and sizes of all members
+
+        The central directory of an archive is enough to tell whether its
+        members changed, without reading any of them.
+        """
+        raise NotImplementedError
+
+
+class CentralDirectory(ArchiveDirectory):
+    """The central directory of the zip archive in `view`, like an mmap()ed
+    archive or a stored archive inside of another one
+
+    Unlike ZipFile, which creates a ZipInfo with a decoded name for every
+    member up front, this only keeps parallel arrays of the fields needed
+    to find and read members. Names stay in the archive and are only
+    decoded for the members that are asked for.
+
+    Members that can't be read here, like encrypted members or those with
+    compression methods other than stored and deflated, are read with
+    ZipFile. Closing the directory releases the view.
+    """
+
+    # Inner archives up to this size are inflated in memory by open_nested()
+    spool_size = 16 * 1024 * 1024
+
+    def __init__(self, view: memoryview) -> None:
+        self.__view = view
+        self.__zipfile: ZipFile | None = None
+        self.__name_offsets = array("Q")
+        self.__name_lengths = array("H")
+        self.__header_offsets = array("Q")
+        self.__methods = array("H")
+        self.__flags = array("H")
+        self.__compressed_sizes = array("Q")
+        self.__sizes = array("Q")
+        self.__crcs = array("L")
+        try:
+            self.__read_entries()
+        except (StructError, ValueError, OverflowError) as e:
+            view.release()
+            raise BadZipFile(f"Bad central directory: {e}") from e
+        except BaseException:
+            view.release()
+            raise
+
+    def __enter__(self) -> "CentralDirectory":
+        return self
+
+    def __exit__(self, *exc_info: T.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.__zipfile is not None:
+            fp = self.__zipfile.fp
+            self.__zipfile.close()
+            T.cast(FileWindow, fp).close()
+            self.__zipfile = None
+        self.__view.release()
+
+    def __read_entries(self) -> None:
+        view = self.__view
+        # The end record is at the very end, unless there is a comment
+        tail_start = max(0, len(view) - END_RECORD.size - 0xFFFF)
+        end = view[tail_start:].tobytes().rfind(END_RECORD_SIGNATURE)
+        if end < 0:
+            raise BadZipFile("File is not a zip file")
+        end += tail_start
+        fields = END_RECORD.unpack_from(view, end)
+        size, offset = fields[5], fields[6]
+
+        directory_end = end
+        locator = end - ZIP64_END_LOCATOR.size
+        if locator >= 0 and view[locator : locator + 4] == ZIP64_END_LOCATOR_SIGNATURE:
+            record = locator - ZIP64_END_RECORD.size
+            fields = ZIP64_END_RECORD.unpack_from(view, record)
+            if fields[0] != ZIP64_END_RECORD_SIGNATURE:
+                raise BadZipFile("Bad zip64 end of central directory record")
+            size, offset = fields[8], fields[9]
+            directory_end = record
+
+        # Data in front of the archive, like in self-extracting archives
+        self.__base = directory_end - size - offset
+        if self.__base < 0:
+            raise BadZipFile("Bad offset of the central directory")
+
+        pos = directory_end - size
+        while pos < directory_end:
+            fields = CENTRAL_HEADER.unpack_from(view, pos)
+            if fields[0] != CENTRAL_HEADER_SIGNATURE:
+                raise BadZipFile("Bad magic number for central directory")
+            name_length, extra_length, comment_length = fields[12:15]
+            compressed_size, file_size, header_offset = (
+                fields[10],
+                fields[11],
+                fields[18],
+            )
+            if 0xFFFFFFFF in (compressed_size, file_size, header_offset):
+                start = pos + CENTRAL_HEADER.size + name_length
+                with view[start : start + extra_length] as extra:
+                    compressed_size, file_size, header_offset = self.__zip64_extra(
+                        extra, compressed_size, file_size, header_offset
+                    )
+
+            self.__name_offsets.append(pos + CENTRAL_HEADER.size)
+            self.__name_lengths.append(name_length)
+            self.__header_offsets.append(header_offset)
+            self.__methods.append(fields[6])
+            self.__flags.append(fields[5])
+            self.__compressed_sizes.append(compressed_size)
+            self.__sizes.append(file_size)
+            self.__crcs.append(fields[9])
+            pos += CENTRAL_HEADER.size + name_length + extra_length + comment_length
+
+    @staticmethod
+    def __zip64_extra(
+        extra: memoryview, compressed_size: int, file_size: int, header_offset: int
+    ) -> tuple[int, int, int]:
+        pos = 0
+        while pos + _EXTRA_HEADER.size <= len(extra):
+            kind, length = _EXTRA_HEADER.unpack_from(extra, pos)
+            pos += _EXTRA_HEADER.size
+            if kind == _ZIP64_EXTRA:
+                # Only the fields that didn't fit are there, in this order
+                values = list(unpack_from(f"<{length // 8}Q", extra, pos))
+                if file_size == 0xFFFFFFFF:
+                    file_size = values.pop(0)
+                if compressed_size == 0xFFFFFFFF:
+                    compressed_size = values.pop(0)
+                if header_offset == 0xFFFFFFFF:
+                    header_offset = values.pop(0)
+                break
+            pos += length
+        return compressed_size, file_size, header_offset
+
+    def __len__(self) -> int:
+        return len(self.__name_offsets)
+
+    def __raw_name(self, index: int) -> memoryview:
+        start = self.__name_offsets[index]
+        return self.__view[start : start + self.__name_lengths[index]]
+
+    def name(self, index: int) -> str:
+        raw = self.__raw_name(index).tobytes()
+        if self.__flags[index] & _UTF8_NAME:
+            return raw.decode("utf-8")
+        return raw.decode("cp437")
+
+    def endswith(self, index: int, suffix: bytes | tuple[bytes, ...]) -> bool:
+        start = self.__name_offsets[index]
+        end = start + self.__name_lengths[index]
+        longest = len(suffix) if isinstance(suffix, bytes) else max(map(len, suffix))
+        return self.__view[max(start, end - longest) : end].tobytes().endswith(suffix)
+
+    def index(self, name: str) -> int | None:
+        raw = name.encode("utf-8")
+        for i, length in enumerate(self.__name_lengths):
+            if length == len(raw) and self.__raw_name(i) == raw:
+                return i
+        return None
+
+    def crc(self, index: int) -> int:
+        return self.__crcs[index]
+
+    def __data_offset(self, index: int) -> int:
+        header = self.__base + self.__header_offsets[index]
+        fields = LOCAL_HEADER.unpack_from(self.__view, header)
+        if fields[0] != LOCAL_HEADER_SIGNATURE:
+            raise BadZipFile("Bad magic number for file header")
+        return header + LOCAL_HEADER.size + fields[-2] + fields[-1]
+
+    def __data(self, index: int) -> memoryview:
+        start = self.__data_offset(index)
+        return self.__view[start : start + self.__compressed_sizes[index]]
+
+    def __readable(self, index: int) -> bool:
+        return not self.__flags[index] & _ENCRYPTED and self.__methods[index] in (
+            ZIP_STORED,
+            ZIP_DEFLATED,
+        )
+
+    def __zipinfo(self, index: int) -> tuple[ZipFile, ZipInfo]:
+        """Fall back to ZipFile for a member"""
+        if self.__zipfile is None:
+            self.__zipfile = ZipFile(FileWindow(self.__view[:]), "r")
+        return self.__zipfile, self.__zipfile.infolist()[index]
+
+    def read(self, index: int) -> bytes:
+        if not self.__readable(index):
+            jar, info = self.__zipinfo(index)
+            return jar.read(info)
+        # The slices of the view are released right away, a slice that is
+        # left in a traceback keeps the mmap from being closed
+        with self.__data(index) as data:
+            if self.__methods[index] == ZIP_STORED:
+                return data.tobytes()
+            try:
+                return zlib.decompress(data, -zlib.MAX_WBITS, self.__sizes[index])
+            except zlib.error as e:
+                raise BadZipFile(f"Bad deflated data: {e}") from e
+
+    def read_head(self, index: int, size: int) -> bytes:
+        if not self.__readable(index):
+            jar, info = self.__zipinfo(index)
+            with jar.open(info, "r") as member:
+                return member.read(size)
+        with self.__data(index) as data:
+            if self.__methods[index] == ZIP_STORED:
+                return data[:size].tobytes()
+
+            inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+            result = b""
+            try:
+                for pos in range(0, len(data), _INFLATE_READ):
+                    with data[pos : pos + _INFLATE_READ] as chunk:
+                        result += inflater.decompress(chunk, size - len(result))
+                    if len(result) >= size or inflater.eof:
+                        break
+            except zlib.error as e:
+                raise BadZipFile(f"Bad deflated data: {e}") from e
+        return result
+
+    @contextmanager
+    def open_nested(self, index: int) -> T.Iterator["CentralDirectory"]:
+        """Open a member that is an archive itself
+
+        A stored member is read in place, through a slice of the view. Other
+        members are inflated, in memory up to `spool_size` and in chunks
+        into a temporary file otherwise.
+        """
+        if self.__readable(index) and self.__methods[index] == ZIP_STORED:
+            with CentralDirectory(self.__data(index)) as nested:
+                yield nested
+        elif self.__sizes[index] <= self.spool_size:
+            with CentralDirectory(memoryview(self.read(index))) as nested:
+                yield nested
+        else:
+            with tempfile.TemporaryFile() as f:
+                self.__inflate_to(index, f)
+                with _map_archive(f) as nested:
+                    yield nested
+
+    def __inflate_to(self, index: int, f: T.IO[bytes]) -> None:
+        if not self.__readable(index):
+            jar, info = self.__zipinfo(index)
+            with jar.open(info, "r") as member:
+                shutil.copyfileobj(member, f, _COPY_CHUNK)
+            return
+
+        inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+        try:
+            with self.__data(index) as data:
+                for pos in range(0, len(data), _COPY_CHUNK):
+                    with data[pos : pos + _COPY_CHUNK] as chunk:
+                        f.write(inflater.decompress(chunk, _COPY_CHUNK))
+                    # Keep the output of each step bounded too
+                    while inflater.unconsumed_tail:
+                        f.write(
+                            inflater.decompress(inflater.unconsumed_tail, _COPY_CHUNK)
+                        )
+        except zlib.error as e:
+            raise BadZipFile(f"Bad deflated data: {e}") from e
+
+    def digest(self) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        for i in range(len(self)):
+            digest.update(self.__raw_name(i))
+            digest.update(_DIGEST_ENTRY.pack(self.__crcs[i], self.__sizes[i]))
+        return digest.digest()
+
+
+class ZipDirectory(ArchiveDirectory):
+    """An ArchiveDirectory for an open ZipFile"""
+
+    def __init__(self, jar: ZipFile) -> None:
+        self.jar = jar
+        self.__infos = jar.infolist()
+        self.__indices: dict[str, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.__infos)
+
+    def name(self, index: int) -> str:
+        return self.__infos[index].filename
+
+    def endswith(self, index: int, suffix: bytes | tuple[bytes, ...]) -> bool:
+        if isinstance(suffix, bytes):
+            suffix = (suffix,)
+        return self.name(index).endswith(tuple(s.decode() for s in suffix))
+
+    def index(self, name: str) -> int | None:
+        if self.__indices is None:
+            self.__indices = {
+                info.filename: i for i, info in reversed(list(enumerate(self.__infos)))
+            }
+        return self.__indices.get(name)
+
+    def crc(self, index: int) -> int:
+        return self.__infos[index].CRC
+
+    def read(self, index: int) -> bytes:
+        return self.jar.read(self.__infos[index])
+
+    def read_head(self, index: int, size: int) -> bytes:
+        info = self.__infos[index]
+        if self.jar.fp is not None:
+            data = read_member_head(self.jar.fp, info, size)
+            if data is not None:
+                return data
+        with self.jar.open(info, "r") as member:
+            return member.read(size)
+
+    @contextmanager
+    def open_nested(self, index: int) -> T.Iterator["ZipDirectory"]:
+        with open_member_archive(self.jar, self.__infos[index]) as nested:
+            yield ZipDirectory(nested)
+
+    def digest(self) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        for info in self.__infos:
+            encoding = "utf-8" if info.flag_bits & _UTF8_NAME else "cp437"
+            digest.update(info.orig_filename.encode(encoding))
+            digest.update(_DIGEST_ENTRY.pack(info.CRC, info.file_size))
+        return digest.digest()
+
+
+@contextmanager
+def open_archive(path: str) -> T.Iterator[CentralDirectory]:
+    """Open the archive at `path` for reading
+
+    The file is mmap()ed, so that the stored archives inside of it can be
+    opened in place.
+    """
+    with open(path, "rb") as f, _map_archive(f) as jar:
+        yield jar
+
+
+@contextmanager
+def open_jmod(path: str) -> T.Iterator[CentralDirectory]:
+    """Open the archive in the JMOD file at `path` for reading
+
+    It is read through a view of the mmap()ed file that starts after the
+    JMOD header.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(JMOD_HEADER)) != JMOD_HEADER:
+            raise BadZipFile("File is not a JMOD file")
+        with _map_archive(f, len(JMOD_HEADER)) as jar:
+            yield jar
+
+
+@contextmanager
+def open_stream_archive(
+    f: T.IO[bytes], size: int, spool_size: int = CentralDirectory.spool_size
+) -> T.Iterator[CentralDirectory]:
+    """Open the archive in the next `size` bytes of the stream `f`
+
+    Archives up to `spool_size` are read into memory, bigger ones are
+    copied to a temporary file, as the central directory is at their end.
+    """
+    if size <= spool_size:
+        with CentralDirectory(memoryview(f.read(size))) as jar:
+            yield jar
+    else:
+        with tempfile.TemporaryFile() as tmp:
+            while size > 0 and (chunk := f.read(min(size, _COPY_CHUNK))):
+                tmp.write(chunk)
+                size -= len(chunk)
+            with _map_archive(tmp) as jar:
+                yield jar
+
+
+@contextmanager
+def _map_archive(f: T.IO[bytes], offset: int = 0) -> T.Iterator[CentralDirectory]:
+    f.flush()
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files can't be mapped, and aren't archives either
+        raise BadZipFile("File is not a zip file")
+    with mapped, CentralDirectory(memoryview(mapped)[offset:]) as jar:
+        yield jar
+
+
+@contextmanager
+def open_member_archive(
+    jar: ZipFile, info: ZipInfo, spool_size: int = 16 * 1024 * 1024
+) -> T.Iterator[ZipFile]:
+    """Open the member `info` of `jar` as an archive of its own
+
+    It is inflated in memory up to `spool_size`, and in chunks into a
+    temporary file otherwise.
+    """
+    if info.file_size <= spool_size:
+        with ZipFile(io.BytesIO(jar.read(info)), "r") as nested:
+            yield nested
+    else:
+        with tempfile.TemporaryFile() as inner:
+            with jar.open(info, "r") as member:
+                shutil.copyfileobj(member, inner, _COPY_CHUNK)
+            inner.seek(0)
+            with ZipFile(inner, "r") as nested:
+                yield nested
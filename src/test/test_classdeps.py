@@ -0,0 +1,97 @@
+from unittest import TestCase
+from zipfile import ZipFile
+import os
+import struct
+import tempfile
+from javatoolkit.classdeps import ClasspathMinimizer, class_references
+from javatoolkit.classpath import Classpath
+
+
+def utf8(text: str) -> bytes:
+    data = text.encode()
+    return struct.pack(">BH", 1, len(data)) + data
+
+
+def create_class(name: str, refs: list[str], descriptor: str = "()V") -> bytes:
+    """A class file with just a constant pool, which refers to `refs`"""
+    pool = [utf8(name), struct.pack(">BH", 7, 1)]
+    # A Long takes two entries
+    pool.append(struct.pack(">BQ", 5, 42))
+    index = 5
+    for ref in refs:
+        pool += [utf8(ref), struct.pack(">BH", 7, index)]
+        index += 2
+    pool.append(utf8(descriptor))
+    count = index + 1
+    return (
+        b"\xca\xfe\xba\xbe"
+        + struct.pack(">HHH", 0, 52, count)
+        + b"".join(pool)
+        + b"\0" * 8
+    )
+
+
+class ClassReferencesTest(TestCase):
+    def test_references(self) -> None:
+        data = create_class(
+            "a/A",
+            ["b/B", "[Lc/C;", "[[I", "java/lang/Object"],
+            "(Ld/D;Ljava/util/List<Le/E;>;)V",
+        )
+        self.assertEqual(
+            class_references(data),
+            {"a/A", "b/B", "c/C", "java/lang/Object", "d/D", "java/util/List", "e/E"},
+        )
+
+    def test_bad_class(self) -> None:
+        with self.assertRaises(ValueError):
+            class_references(b"PK\x03\x04")
+        with self.assertRaises(ValueError):
+            class_references(create_class("a/A", ["b/B"])[:20])
+
+
+class ClasspathMinimizerTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        d = self.dir = tmpdir.name
+        self.write_jar("app.jar", {"app/Main": ["lib/A", "java/lang/Object"]})
+        self.write_jar("a.jar", {"lib/A": ["lib/B"]})
+        self.write_jar("b.jar", {"lib/B": [], "lib/Unused": ["lib/C"]})
+        self.write_jar("c.jar", {"lib/C": []})
+        self.write_jar("unused.jar", {"other/X": []})
+        os.makedirs(f"{d}/classes/lib")
+        with open(f"{d}/classes/lib/D.class", "wb") as f:
+            f.write(create_class("lib/D", ["lib/C"]))
+        self.classpath = Classpath(
+            ":".join(
+                f"{d}/{entry}"
+                for entry in ["unused.jar", "c.jar", "b.jar", "a.jar", "classes"]
+            )
+        )
+        self.minimizer = ClasspathMinimizer(self.classpath)
+        self.addCleanup(self.minimizer.close)
+
+    def write_jar(self, name: str, classes: dict[str, list[str]]) -> None:
+        with ZipFile(f"{self.dir}/{name}", "w") as jar:
+            for class_name, refs in classes.items():
+                jar.writestr(f"{class_name}.class", create_class(class_name, refs))
+
+    def test_roots(self) -> None:
+        d = self.dir
+        self.assertEqual(
+            self.minimizer.minimize(roots=[f"{d}/app.jar"]).classpath,
+            [f"{d}/b.jar", f"{d}/a.jar"],
+        )
+
+    def test_classes(self) -> None:
+        d = self.dir
+        self.assertEqual(
+            self.minimizer.minimize(["lib.D"]).classpath,
+            [f"{d}/c.jar", f"{d}/classes"],
+        )
+        self.assertEqual(
+            self.minimizer.minimize(["lib.B"], [f"{d}/unused.jar"]).classpath,
+            [f"{d}/unused.jar", f"{d}/b.jar"],
+        )
+        self.assertEqual(self.minimizer.minimize(["x.Missing"]).classpath, [])
@@ -0,0 +1,91 @@
+from unittest import TestCase
+import os
+import sqlite3
+import tempfile
+from javatoolkit.classindex import ClassIndex
+from .test_cvv import write_jar
+
+
+class ClassIndexTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.dir = tmpdir.name
+        self.a = f"{self.dir}/a.jar"
+        self.b = f"{self.dir}/b.jar"
+        write_jar(self.a, [("org/foo/Bar.class", 8), ("org/foo/Baz.class", 8)])
+        write_jar(self.b, [("org/foo/Bar$1.class", 8), ("com/x/Y.class", 8)])
+        self.jars = [("foo", self.a), ("bar", self.b)]
+        self.index = ClassIndex(f"{self.dir}/index/findclass.db")
+        self.addCleanup(self.index.close)
+
+    def test_lookup(self) -> None:
+        self.assertEqual(self.index.refresh(self.jars), (2, 0))
+        self.assertEqual(self.index.lookup("org/foo/Bar"), self.jars)
+        self.assertEqual(self.index.lookup("org/foo/Baz"), [("foo", self.a)])
+        self.assertEqual(self.index.lookup("com/x"), [("bar", self.b)])
+        self.assertEqual(self.index.lookup("x/Y"), [("bar", self.b)])
+        self.assertEqual(self.index.lookup(r"x/Y\.class"), [("bar", self.b)])
+        self.assertEqual(self.index.lookup("Ba[rz]"), self.jars)
+
+    def test_plain_name(self) -> None:
+        # Found anywhere in the names, like without the index
+        self.index.refresh(self.jars)
+        self.assertEqual(self.index.lookup("Baz"), [("foo", self.a)])
+        self.assertEqual(self.index.lookup("Y"), [("bar", self.b)])
+        self.assertEqual(self.index.lookup("Ba"), self.jars)
+        self.assertEqual(self.index.lookup("foo/Baz"), [("foo", self.a)])
+        self.assertEqual(self.index.lookup("rg/foo"), self.jars)
+        self.assertEqual(self.index.lookup("foo/Qux"), [])
+        # A dot makes it a regular expression
+        self.assertEqual(self.index.lookup("x.Y"), [("bar", self.b)])
+
+    def test_planned_lookup(self) -> None:
+        self.index.refresh(self.jars)
+        # Through the names, the reversed names and the trigrams
+        self.assertEqual(self.index.lookup(r"^org/foo/Bar\.cl"), [("foo", self.a)])
+        self.assertEqual(self.index.lookup(r"^co"), [("bar", self.b)])
+        self.assertEqual(self.index.lookup(r"\$1\.class$"), [("bar", self.b)])
+        self.assertEqual(self.index.lookup(r"/Ba[rz]\.class$"), [("foo", self.a)])
+        self.assertEqual(self.index.lookup(r"foo/Ba.\$"), [("bar", self.b)])
+        self.assertEqual(self.index.lookup(r"(x|foo)/(Y|Baz)"), self.jars)
+        self.assertEqual(self.index.lookup(r"(?i)COM/X"), [("bar", self.b)])
+        self.assertEqual(self.index.lookup(r"x/Qu+x"), [])
+        self.assertEqual(self.index.lookup(r"org/fo+/Baz?"), self.jars)
+
+    def test_schema_version(self) -> None:
+        self.index.refresh(self.jars)
+        self.index.close()
+        db = sqlite3.connect(f"{self.dir}/index/findclass.db")
+        db.execute("PRAGMA user_version = 1")
+        db.close()
+        self.index = ClassIndex(f"{self.dir}/index/findclass.db")
+        self.addCleanup(self.index.close)
+        self.assertEqual(self.index.lookup("org/foo/Bar"), [])
+        self.assertEqual(self.index.refresh(self.jars), (2, 0))
+
+    def test_refresh(self) -> None:
+        self.index.refresh(self.jars)
+        self.assertEqual(self.index.refresh(self.jars), (0, 0))
+
+        write_jar(self.a, [("org/foo/Qux.class", 8)])
+        self.assertEqual(self.index.refresh(self.jars), (1, 0))
+        self.assertEqual(self.index.lookup("org/foo/Qux"), [("foo", self.a)])
+        self.assertEqual(self.index.lookup("org/foo/Baz"), [])
+
+        # Moved or renamed packages are kept up to date without reading them
+        self.assertEqual(self.index.refresh(self.jars[::-1]), (0, 0))
+        self.assertEqual(self.index.lookup("org/foo"), self.jars[::-1])
+        renamed = [("foo-2", self.a), ("bar", self.b)]
+        self.assertEqual(self.index.refresh(renamed), (0, 0))
+        self.assertEqual(self.index.lookup("org/foo"), renamed)
+
+        self.assertEqual(self.index.refresh(self.jars[1:]), (0, 1))
+        self.assertEqual(self.index.lookup("org/foo/Qux"), [])
+        self.assertEqual(self.index.refresh(self.jars, rebuild=True, jobs=2), (2, 0))
+        self.assertEqual(self.index.lookup("org/foo/Qux"), [("foo", self.a)])
+
+    def test_missing_jar(self) -> None:
+        os.unlink(self.b)
+        self.assertEqual(self.index.refresh(self.jars), (1, 0))
+        self.assertEqual(self.index.lookup("com/x"), [])
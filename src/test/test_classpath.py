@@ -0,0 +1,31 @@
+from unittest import TestCase
+import os
+import tempfile
+from javatoolkit.classpath import Classpath, ClasspathProblem
+from .test_cvv import write_jar
+
+
+class ValidateTest(TestCase):
+    def test_validate(self) -> None:
+        with tempfile.TemporaryDirectory() as d:
+            write_jar(f"{d}/a.jar", [("A.class", 8)])
+            os.symlink(f"{d}/a.jar", f"{d}/link.jar")
+            with open(f"{d}/text.jar", "w") as f:
+                f.write("not a zip")
+            os.mkdir(f"{d}/classes")
+            classpath = Classpath(
+                f"{d}/a.jar:{d}/missing.jar:{d}/link.jar:{d}/text.jar::"
+                f"{d}/classes:{d}/a.jar:{d}/classes/"
+            )
+            expected = [
+                ClasspathProblem(f"{d}/missing.jar", "missing", None),
+                ClasspathProblem(f"{d}/link.jar", "duplicate", f"{d}/a.jar"),
+                ClasspathProblem(f"{d}/text.jar", "not a zip", None),
+                ClasspathProblem(f"{d}/a.jar", "duplicate", f"{d}/a.jar"),
+                ClasspathProblem(f"{d}/classes/", "duplicate", f"{d}/classes"),
+            ]
+            self.assertEqual(classpath.validate(jobs=4), expected)
+
+            # Checked once per process
+            os.unlink(f"{d}/text.jar")
+            self.assertEqual(classpath.validate(), expected)
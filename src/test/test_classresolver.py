@@ -0,0 +1,37 @@
+from unittest import TestCase
+import os
+import tempfile
+from javatoolkit.classpath import Classpath
+from javatoolkit.classresolver import ClassResolver
+from .test_cvv import create_class_header, write_jar
+
+
+class ClassResolverTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        d = self.dir = tmpdir.name
+        write_jar(f"{d}/a.jar", [("a/A.class", 8), ("a/B.class", 8)])
+        write_jar(f"{d}/b.jar", [("a/B.class", 11), ("b/C.class", 11)])
+        os.makedirs(f"{d}/classes/c")
+        with open(f"{d}/classes/c/D.class", "wb") as f:
+            f.write(create_class_header(17))
+        self.classpath = Classpath(f"{d}/missing.jar:{d}/a.jar::{d}/b.jar:{d}/classes")
+        self.resolver = ClassResolver(self.classpath, max_open=1)
+        self.addCleanup(self.resolver.close)
+
+    def test_find(self) -> None:
+        d = self.dir
+        self.assertEqual(self.resolver.find("a/A.class"), f"{d}/a.jar")
+        self.assertEqual(self.resolver.find("a/B.class"), f"{d}/a.jar")
+        self.assertEqual(self.resolver.find_class("b.C"), f"{d}/b.jar")
+        self.assertEqual(self.resolver.find("c/D.class"), f"{d}/classes")
+        self.assertIsNone(self.resolver.find("x/Y.class"))
+        self.assertEqual(self.resolver.find("a/B.class"), f"{d}/a.jar")
+
+    def test_read(self) -> None:
+        self.assertEqual(self.resolver.read("a/B.class"), create_class_header(8))
+        self.assertEqual(self.resolver.read("b/C.class"), create_class_header(11))
+        self.assertEqual(self.resolver.read("a/A.class"), create_class_header(8))
+        self.assertEqual(self.resolver.read("c/D.class"), create_class_header(17))
+        self.assertIsNone(self.resolver.read("x/Y.class"))
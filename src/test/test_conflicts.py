@@ -0,0 +1,53 @@
+from unittest import TestCase
+import tempfile
+import typing as T
+from javatoolkit.conflicts import Conflict, ConflictFinder, read_classes
+from .test_cvv import write_jar
+
+
+class ConflictFinderTest(TestCase):
+    def test_conflicts(self) -> None:
+        finder = ConflictFinder()
+        finder.add_jar("a.jar", [("org/foo/A.class", 1), ("org/foo/B.class", 2)])
+        finder.add_jar("b.jar", [("org/foo/A.class", 1), ("org/foo/B.class", 2)])
+        finder.add_jar("c.jar", [("org/foo/B.class", 3), ("org/bar/C.class", 4)])
+        finder.add_jar("d.jar", [("org/bar/D.class", 5), ("E.class", 6)])
+        finder.add_jar("e.jar", [("E.class", 6)])
+        self.assertEqual(
+            finder.conflicts(),
+            [
+                Conflict("duplicate", "E", ["d.jar", "e.jar"]),
+                Conflict("split", "org.bar", ["c.jar", "d.jar"]),
+                Conflict("split", "org.foo", ["a.jar", "b.jar", "c.jar"]),
+                Conflict("duplicate", "org.foo.A", ["a.jar", "b.jar"]),
+                Conflict("conflict", "org.foo.B", ["a.jar", "b.jar", "c.jar"]),
+            ],
+        )
+
+    def test_identical_copies(self) -> None:
+        finder = ConflictFinder()
+        finder.add_jar("a.jar", [("org/foo/A.class", 1)])
+        finder.add_jar("b.jar", [("org/foo/A.class", 1)])
+        self.assertEqual(
+            finder.conflicts(), [Conflict("duplicate", "org.foo.A", ["a.jar", "b.jar"])]
+        )
+
+    def test_read_classes(self) -> None:
+        with tempfile.TemporaryDirectory() as d:
+            write_jar(
+                f"{d}/a.jar",
+                [
+                    ("org/A.class", 8),
+                    ("module-info.class", 9),
+                    ("META-INF/versions/11/org/A.class", 11),
+                    ("org/B.class", 11),
+                ],
+                multi_release=True,
+            )
+            classes = read_classes(f"{d}/a.jar")
+            self.assertIsNotNone(classes)
+            self.assertEqual(
+                [name for name, _ in T.cast(list, classes)],
+                ["org/A.class", "org/B.class"],
+            )
+            self.assertIsNone(read_classes(f"{d}/missing.jar"))
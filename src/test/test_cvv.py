@@ -1,10 +1,16 @@
 from unittest import TestCase
+import unittest
 import io
 import javatoolkit.cvv as cvv
-from zipfile import ZipFile
+from zipfile import BadZipFile, ZipFile, ZIP_DEFLATED
+import shutil
 import struct
+import subprocess
+import tarfile
 import typing as T
 import os
+import tempfile
+from .test_ziputil import corrupt_member
 
 
 def create_class_header(version: int) -> bytes:
@@ -18,8 +24,12 @@ def create_class_file(version: int) -> io.BytesIO:
     return io.BytesIO(create_class_header(version))
 
 
-def create_jar(files: list[tuple[str, int]], multi_release: bool = False) -> ZipFile:
-    result = ZipFile(io.BytesIO(), "w")
+def create_jar(
+    files: list[tuple[str, int]],
+    multi_release: bool = False,
+    file: str | T.IO[bytes] | None = None,
+) -> ZipFile:
+    result = ZipFile(file or io.BytesIO(), "w")
     for path, version in files:
         result.writestr(path, create_class_header(version))
     manifest = f"""Manifest-Version: 1.0
@@ -306,3 +316,349 @@ class SimpleTest(TestCase):
         )
         self.assertListEqual(m.bad, [])
         self.assertListEqual(m.skipped, [])
+
+    def test_nested_jars(self) -> None:
+        inner = io.BytesIO()
+        create_jar([("a/B.class", 11), ("a/C.class", 8)], file=inner).close()
+        outer = ZipFile(io.BytesIO(), "w")
+        outer.writestr("WEB-INF/classes/X.class", create_class_header(8))
+        outer.writestr("WEB-INF/lib/x.jar", inner.getvalue())
+        outer.writestr("WEB-INF/lib/broken.jar", b"not a jar")
+
+        m = cvv.CVVMagic("8")
+        war = cvv.FileLoc("outer.war")
+        m.do_jar(outer, war)
+
+        x_jar = cvv.JarLoc(war, "WEB-INF/lib/x.jar")
+        self.assertEqual(cvv.JarLoc(x_jar, "a/B.class").file, war)
+        self.assertListEqual(
+            m.good,
+            [
+                cvv.ClassFile(cvv.JarLoc(war, "WEB-INF/classes/X.class"), "1.8", "1.8"),
+                cvv.ClassFile(cvv.JarLoc(x_jar, "a/C.class"), "1.8", "1.8"),
+            ],
+        )
+        self.assertListEqual(
+            m.bad, [cvv.ClassFile(cvv.JarLoc(x_jar, "a/B.class"), "11", "1.8")]
+        )
+        self.assertListEqual(
+            m.skipped,
+            [
+                cvv.SkippedNestedArchive(
+                    cvv.JarLoc(war, "WEB-INF/lib/broken.jar"),
+                    "Not a valid archive: File is not a zip file",
+                )
+            ],
+        )
+
+    def test_class_file_versions(self) -> None:
+        cf = cvv.ClassFile(cvv.FileLoc("A.class"), "1.8", "11")
+        self.assertEqual(cf, cvv.ClassFile(cvv.FileLoc("A.class"), 8, 11))
+        self.assertEqual((cf.encoded_version, cf.expected_version), ("1.8", "11"))
+        match cf:
+            case cvv.ClassFile(cvv.FileLoc(path), encoded, expected):
+                self.assertEqual((path, encoded, expected), ("A.class", "1.8", "11"))
+
+    def test_compact(self) -> None:
+        files = [("a/A.class", 8), ("a/B.class", 7), ("a/C.class", 11)]
+        m = cvv.CVVMagic("8", compact=True)
+        m.do_jar(create_jar(files), cvv.FileLoc("a.jar"))
+        m.do_class(create_class_file(6), cvv.FileLoc("D.class"))
+        self.assertIsInstance(m.good, cvv.ClassFileColumns)
+        self.assertListEqual(
+            list(m.good),
+            [
+                cvv.ClassFile(cvv.JarLoc(cvv.FileLoc("a.jar"), "a/A.class"), 8, 8),
+                cvv.ClassFile(cvv.JarLoc(cvv.FileLoc("a.jar"), "a/B.class"), 7, 8),
+                cvv.ClassFile(cvv.FileLoc("D.class"), 6, 8),
+            ],
+        )
+        self.assertIs(m.good[0].loc.jar, m.good[1].loc.jar)
+
+
+def write_jar(
+    path: str, files: list[tuple[str, int]], multi_release: bool = False
+) -> None:
+    create_jar(files, multi_release, path).close()
+
+
+class ParallelTest(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        d = self.tmpdir.name
+        self.files = [f"{d}/a.jar", f"{d}/B.class", f"{d}/big.jar", f"{d}/c.jar"]
+
+        write_jar(self.files[0], [("A.class", 8), ("module-info.class", 9)])
+        with open(self.files[1], "wb") as f:
+            f.write(create_class_header(11))
+        write_jar(
+            self.files[2],
+            [(f"p/C{i}.class", 8 + i % 3) for i in range(40)]
+            + [(f"META-INF/versions/9/p/C{i}.class", 9) for i in range(10)]
+            + [(f"META-INF/versions/7/p/C{i}.class", 7) for i in range(10)],
+        )
+        write_jar(self.files[3], [("C.class", 10)], multi_release=True)
+
+    def check_same_as_serial(self, m: cvv.CVVMagic) -> None:
+        serial = cvv.CVVMagic("8")
+        serial.do_many(self.files)
+        self.assertListEqual(m.good, serial.good)
+        self.assertListEqual(m.bad, serial.bad)
+        self.assertListEqual(m.skipped, serial.skipped)
+
+    def test_parallel(self) -> None:
+        m = cvv.CVVMagic("8")
+        m.do_many(self.files, jobs=2)
+        self.check_same_as_serial(m)
+        self.assertEqual(len(m.bad), 29)
+
+    def test_split_jar(self) -> None:
+        m = cvv.CVVMagic("8")
+        m.split_size = 0
+        m.split_members = 7
+        m.do_many(self.files, jobs=3)
+        self.check_same_as_serial(m)
+
+    def test_iter_many(self) -> None:
+        serial = cvv.CVVMagic("8")
+        serial.do_many(self.files)
+
+        for jobs in 1, 2:
+            m = cvv.CVVMagic("8")
+            results = list(m.iter_many(self.files, jobs))
+            self.assertListEqual([r for s, r in results if s == "bad"], serial.bad)
+            self.assertListEqual(
+                [r for s, r in results if s == "skipped"], serial.skipped
+            )
+            self.assertEqual(len(results), len(serial.bad) + len(serial.skipped))
+            self.assertListEqual(m.good + m.bad + m.skipped, [])
+            self.assertEqual(m.good_count, len(serial.good))
+            self.assertEqual(m.bad_count, len(serial.bad))
+
+    def test_iter_many_good(self) -> None:
+        m = cvv.CVVMagic("8")
+        goods = [r for s, r in m.iter_many(self.files, good=True) if s == "good"]
+        serial = cvv.CVVMagic("8")
+        serial.do_many(self.files)
+        self.assertListEqual(goods, serial.good)
+
+    def test_iter_many_stop(self) -> None:
+        m = cvv.CVVMagic("8")
+        for jobs in 1, 2:
+            results = m.iter_many(self.files, jobs)
+            self.assertEqual(next(results)[0], "skipped")
+            self.assertEqual(next(results)[0], "bad")
+            results.close()
+        self.assertEqual(m.bad_count, 2)
+
+    def test_corrupt_member(self) -> None:
+        with ZipFile(self.files[0], "w", ZIP_DEFLATED) as jar:
+            jar.writestr("A.class", create_class_header(8))
+        corrupt_member(self.files[0], "A.class")
+        for jobs in 1, 2:
+            with self.assertRaises(BadZipFile):
+                cvv.CVVMagic("8").do_many(self.files, jobs)
+
+
+class FindFilesTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.dir = tmpdir.name
+        os.makedirs(f"{self.dir}/lib/sub")
+        for name in "A.class", "a.jar", "README", "lib/b.war", "lib/sub/C.class":
+            open(f"{self.dir}/{name}", "wb").close()
+        os.link(f"{self.dir}/a.jar", f"{self.dir}/lib/a-link.jar")
+        os.symlink(f"{self.dir}/A.class", f"{self.dir}/lib/S.class")
+        os.symlink(f"{self.dir}/lib", f"{self.dir}/lib-link")
+
+    def find(self, paths: list[str], recurse: bool) -> list[str]:
+        found = cvv.CVVMagic.find_files(paths, recurse)
+        return sorted(os.path.relpath(p, self.dir) for p in found)
+
+    def test_recurse(self) -> None:
+        self.assertEqual(
+            self.find([self.dir], True),
+            ["A.class", "a.jar", "lib/b.war", "lib/sub/C.class"],
+        )
+
+    def test_no_recurse(self) -> None:
+        paths = [self.dir, f"{self.dir}/A.class", f"{self.dir}/README"]
+        self.assertEqual(self.find(paths, False), ["A.class"])
+
+    def test_hardlinks(self) -> None:
+        paths = [f"{self.dir}/lib/a-link.jar", f"{self.dir}/a.jar"]
+        self.assertEqual(self.find(paths, False), ["lib/a-link.jar"])
+
+    def test_symlinks(self) -> None:
+        self.assertEqual(
+            self.find([f"{self.dir}/lib-link"], True),
+            ["lib-link/a-link.jar", "lib-link/b.war", "lib-link/sub/C.class"],
+        )
+        self.assertEqual(self.find([f"{self.dir}/lib/S.class"], True), [])
+        self.assertEqual(self.find([f"{self.dir}/lib/S.class"], False), [])
+
+
+def create_tar(files: list[tuple[str, bytes]], mode: str = "w") -> bytes:
+    result = io.BytesIO()
+    with tarfile.open(fileobj=result, mode=mode) as tar:
+        for name, data in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return result.getvalue()
+
+
+class BinpkgTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.dir = tmpdir.name
+        jar = io.BytesIO()
+        create_jar([("A.class", 8), ("B.class", 11)], file=jar).close()
+        self.files = [
+            ("usr/share/foo/lib/foo.jar", jar.getvalue()),
+            ("usr/share/foo/C.class", create_class_header(11)),
+            ("usr/share/doc/foo/README", b"readme"),
+            ("usr/share/foo/lib/broken.jar", b"not a jar"),
+        ]
+
+    def check(self, path: str) -> None:
+        m = cvv.CVVMagic("8")
+        m.do(path)
+        pkg = cvv.FileLoc(path)
+        jar = cvv.JarLoc(pkg, "usr/share/foo/lib/foo.jar")
+        self.assertEqual(
+            [cf.loc for cf in m.bad],
+            [cvv.JarLoc(pkg, "usr/share/foo/C.class"), cvv.JarLoc(jar, "B.class")],
+        )
+        self.assertEqual([cf.loc for cf in m.good], [cvv.JarLoc(jar, "A.class")])
+        self.assertEqual(len(m.skipped), 1)
+
+    def write_gpkg(self, image: bytes, compression: str) -> str:
+        path = f"{self.dir}/foo-1.gpkg.tar"
+        data = create_tar(
+            [
+                ("foo-1/gpkg-1", b""),
+                (f"foo-1/metadata.tar.{compression}", b""),
+                (f"foo-1/image.tar.{compression}", image),
+                ("foo-1/Manifest", b""),
+            ]
+        )
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_gpkg(self) -> None:
+        files = [(f"image/{name}", data) for name, data in self.files]
+        self.check(self.write_gpkg(create_tar(files, "w:xz"), "xz"))
+
+    @unittest.skipUnless(shutil.which("zstd"), "needs zstd")
+    def test_gpkg_zstd(self) -> None:
+        files = [(f"image/{name}", data) for name, data in self.files]
+        image = subprocess.run(
+            ["zstd", "-cq"], input=create_tar(files), stdout=subprocess.PIPE
+        ).stdout
+        self.check(self.write_gpkg(image, "zst"))
+
+    def test_tbz2(self) -> None:
+        path = f"{self.dir}/foo-1.tbz2"
+        files = [(f"./{name}", data) for name, data in self.files]
+        with open(path, "wb") as f:
+            f.write(create_tar(files, "w:bz2"))
+            f.write(b"XPAKPACK" + bytes(64) + b"XPAKSTOP")
+        self.check(path)
+
+    def test_parallel(self) -> None:
+        files = [(f"image/{name}", data) for name, data in self.files]
+        path = self.write_gpkg(create_tar(files, "w:gz"), "gz")
+        m = cvv.CVVMagic("8")
+        m.do_many([path, path], jobs=2)
+        self.assertEqual(len(m.bad), 4)
+
+
+class JmodTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = f"{tmpdir.name}/foo.jmod"
+        # Like the jmod tool, the offsets in the archive don't count the
+        # header in front of it
+        data = io.BytesIO()
+        with ZipFile(data, "w") as jmod:
+            for name, version in [
+                ("classes/module-info.class", 11),
+                ("classes/a/A.class", 8),
+                ("classes/a/B.class", 11),
+                ("classes/META-INF/versions/11/a/A.class", 11),
+                ("legal/LICENSE.class", 11),
+            ]:
+                jmod.writestr(name, create_class_header(version))
+            jmod.writestr("bin/tool", b"")
+        with open(self.path, "wb") as f:
+            f.write(b"JM\x01\x00" + data.getvalue())
+
+    def check(self, m: cvv.CVVMagic) -> None:
+        jmod = cvv.FileLoc(self.path)
+        self.assertEqual(
+            [f.loc for f in m.skipped], [cvv.JarLoc(jmod, "module-info.class")]
+        )
+        self.assertEqual([f.loc for f in m.good], [cvv.JarLoc(jmod, "a/A.class")])
+        self.assertEqual(
+            [f.loc for f in m.bad],
+            [
+                cvv.JarLoc(jmod, "a/B.class"),
+                cvv.JarLoc(jmod, "META-INF/MANIFEST.MF"),
+            ],
+        )
+
+    def test_jmod(self) -> None:
+        m = cvv.CVVMagic("8")
+        m.do(self.path)
+        self.check(m)
+
+    def test_split_jmod(self) -> None:
+        m = cvv.CVVMagic("8")
+        m.split_size = 0
+        m.split_members = 2
+        m.do_many([self.path], jobs=2)
+        self.check(m)
+
+    def test_not_a_jmod(self) -> None:
+        with open(self.path, "r+b") as f:
+            f.write(b"PK")
+        with self.assertRaises(BadZipFile):
+            cvv.CVVMagic("8").do(self.path)
+
+
+class SampleTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.dir = tmpdir.name
+
+    def test_sample(self) -> None:
+        path = f"{self.dir}/a.jar"
+        files = [(f"a/A{i}.class", 8) for i in range(100)]
+        files += [(f"META-INF/versions/11/a/A{i}.class", 11) for i in range(20)]
+        files.append(("module-info.class", 9))
+        write_jar(path, files, multi_release=True)
+
+        for jobs in 1, 2:
+            m = cvv.CVVMagic("8", sample=5)
+            m.do_many([path], jobs)
+            self.assertEqual(m.sampled_count, 1)
+            self.assertEqual(m.sampled_read + m.sampled_unread, 121)
+            self.assertEqual(m.good_count, 10)
+            self.assertEqual(m.skipped_count, 1)
+            self.assertEqual(m.bad_count, 0)
+
+    def test_escalate(self) -> None:
+        path = f"{self.dir}/a.jar"
+        write_jar(path, [(f"a/A{i}.class", 11) for i in range(100)])
+        for jobs in 1, 2:
+            m = cvv.CVVMagic("8", sample=5)
+            m.do_many([path], jobs)
+            self.assertEqual(m.sampled_count, 0)
+            self.assertEqual(m.bad_count, 100)
@@ -0,0 +1,68 @@
+from unittest import TestCase, mock
+import os
+import tempfile
+import threading
+import javatoolkit.cvv as cvv
+from javatoolkit.daemon import DaemonClient, DaemonError, JarDaemon, make_private_dir
+from .test_cvv import write_jar
+
+
+class JarDaemonTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.jar = f"{tmpdir.name}/a.jar"
+        write_jar(self.jar, [("A.class", 8), ("B.class", 11)])
+
+        self.socket = f"{tmpdir.name}/daemon.sock"
+        server = JarDaemon(self.socket)
+        thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+
+        client = DaemonClient.connect(self.socket)
+        assert client is not None
+        self.addCleanup(client.close)
+        self.client = client
+
+    def test_not_running(self) -> None:
+        self.assertIsNone(DaemonClient.connect(f"{self.socket}.missing"))
+
+    def test_other_user(self) -> None:
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            self.assertIsNone(DaemonClient.connect(self.socket))
+
+    def test_private_dir(self) -> None:
+        path = f"{os.path.dirname(self.socket)}/run"
+        make_private_dir(path)
+        make_private_dir(path)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o700)
+        os.chmod(path, 0o755)
+        with self.assertRaises(PermissionError):
+            make_private_dir(path)
+
+    def test_names(self) -> None:
+        self.assertEqual(
+            self.client.names(self.jar), ["A.class", "B.class", "META-INF/MANIFEST.MF"]
+        )
+        write_jar(self.jar, [("C.class", 8)])
+        self.assertEqual(
+            self.client.names(self.jar), ["C.class", "META-INF/MANIFEST.MF"]
+        )
+
+    def test_check(self) -> None:
+        for _ in range(2):
+            m = cvv.CVVMagic("8", self.client)
+            m.do(self.jar)
+            self.assertEqual([f.loc.member for f in m.bad], ["B.class"])
+            self.assertEqual(len(m.good), 1)
+
+    def test_errors(self) -> None:
+        with self.assertRaises(DaemonError):
+            self.client.names(f"{self.jar}.missing")
+        with open(self.jar, "wb") as f:
+            f.write(b"not a jar")
+        self.assertEqual(self.client.lookup(self.jar), (None, None))
+        self.assertEqual(self.client.request("ping"), "pong")
@@ -0,0 +1,87 @@
+from unittest import TestCase
+import tempfile
+import javatoolkit.cvv as cvv
+from javatoolkit.histogram import VersionHistogram
+from .test_cvv import create_class_header, write_jar
+
+
+class VersionHistogramTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.dir = tmpdir.name
+
+    def test_counts(self) -> None:
+        write_jar(
+            f"{self.dir}/a.jar",
+            [
+                ("A.class", 8),
+                ("B.class", 8),
+                ("C.class", 11),
+                ("META-INF/versions/11/A.class", 11),
+                ("META-INF/versions/17/A.class", 17),
+            ],
+            multi_release=True,
+        )
+        with open(f"{self.dir}/D.class", "wb") as f:
+            f.write(create_class_header(9))
+
+        histogram = VersionHistogram([self.dir])
+        m = cvv.CVVMagic("8", histogram=histogram)
+        m.do_many([f"{self.dir}/a.jar", f"{self.dir}/D.class"])
+        self.assertEqual(
+            histogram.to_json(),
+            {
+                "archives": {
+                    f"{self.dir}/a.jar": {
+                        "classes": {"8": 2, "11": 2, "17": 1},
+                        "max": 17,
+                        "multi_release_layers": 2,
+                    },
+                    self.dir: {
+                        "classes": {"9": 1},
+                        "max": 9,
+                        "multi_release_layers": 0,
+                    },
+                },
+                "dirs": {self.dir: 17},
+            },
+        )
+        lines = list(histogram.format_table())
+        self.assertIn("   17        5   2  1.8:2 11:2 17:1", lines[2])
+
+    def test_ignored_layers(self) -> None:
+        write_jar(
+            f"{self.dir}/a.jar",
+            [
+                ("A.class", 8),
+                ("META-INF/versions/8/A.class", 8),
+                ("META-INF/versions/x/A.class", 8),
+                ("META-INF/versions/11/A.class", 11),
+            ],
+            multi_release=True,
+        )
+        histogram = VersionHistogram([self.dir])
+        cvv.CVVMagic("8", histogram=histogram).do(f"{self.dir}/a.jar")
+        archive = histogram.to_json()["archives"][f"{self.dir}/a.jar"]
+        self.assertEqual(archive["multi_release_layers"], 1)
+
+    def test_top_dirs(self) -> None:
+        histogram = VersionHistogram(["/usr/share", "/usr/share/foo/lib"])
+        for path, version in [
+            ("/usr/share/foo/A.class", 8),
+            ("/usr/share/foo/sub/B.class", 11),
+            ("/usr/share/foo/lib/x/C.class", 17),
+            ("/usr/share/D.class", 9),
+            ("/opt/E.class", 21),
+        ]:
+            histogram.add_class(cvv.FileLoc(path), version)
+        self.assertEqual(
+            histogram.to_json()["dirs"],
+            {
+                "/opt": 21,
+                "/usr/share": 9,
+                "/usr/share/foo": 11,
+                "/usr/share/foo/lib/x": 17,
+            },
+        )
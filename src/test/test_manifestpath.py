@@ -0,0 +1,83 @@
+from unittest import TestCase
+from zipfile import ZipFile
+import os
+import tempfile
+import typing as T
+from javatoolkit.classpath import Classpath
+from javatoolkit.manifestpath import ManifestClasspath, read_main_section
+
+
+def write_manifest_jar(path: str, manifest: str) -> None:
+    with ZipFile(path, "w") as jar:
+        jar.writestr("META-INF/MANIFEST.MF", manifest)
+
+
+class ManifestClasspathTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        d = self.dir = tmpdir.name
+        os.makedirs(f"{d}/lib/sub")
+        os.makedirs(f"{d}/classes")
+        write_manifest_jar(
+            f"{d}/a.jar",
+            "Manifest-Version: 1.0\r\nClass-Path: lib/b.jar lib/missing.jar \r\n"
+            " classes/ http://example.org/x.jar\r\n\r\n"
+            "Name: x/Y.class\r\nClass-Path: lib/ignored.jar\r\n\r\n",
+        )
+        write_manifest_jar(f"{d}/lib/b.jar", "Class-Path: sub/c%20d.jar ../a.jar\n")
+        write_manifest_jar(f"{d}/lib/sub/c d.jar", "Class-Path: ../b.jar\n")
+        write_manifest_jar(f"{d}/lib/ignored.jar", "Manifest-Version: 1.0\n")
+        self.manifests = ManifestClasspath()
+
+    def test_read_main_section(self) -> None:
+        self.assertEqual(
+            read_main_section(f"{self.dir}/lib/b.jar"),
+            "Class-Path: sub/c%20d.jar ../a.jar\n",
+        )
+        self.assertNotIn("Name:", T.cast(str, read_main_section(f"{self.dir}/a.jar")))
+        self.assertIsNone(read_main_section(f"{self.dir}/missing.jar"))
+
+    def test_class_path(self) -> None:
+        d = self.dir
+        self.assertEqual(
+            self.manifests.class_path(f"{d}/a.jar"),
+            [f"{d}/lib/b.jar", f"{d}/lib/missing.jar", f"{d}/classes/"],
+        )
+        self.assertEqual(
+            self.manifests.class_path(f"{d}/lib/b.jar"),
+            [f"{d}/lib/sub/c d.jar", f"{d}/a.jar"],
+        )
+
+    def test_expand(self) -> None:
+        d = self.dir
+        expanded = self.manifests.expand(Classpath(f"{d}/a.jar:{d}/given.jar"))
+        self.assertEqual(
+            expanded.classpath,
+            [
+                f"{d}/a.jar",
+                f"{d}/lib/b.jar",
+                f"{d}/lib/sub/c d.jar",
+                f"{d}/classes/",
+                f"{d}/given.jar",
+            ],
+        )
+        self.assertEqual(
+            self.manifests.expand([f"{d}/lib/sub/c d.jar"]).classpath,
+            [
+                f"{d}/lib/sub/c d.jar",
+                f"{d}/lib/b.jar",
+                f"{d}/a.jar",
+                f"{d}/classes/",
+            ],
+        )
+
+    def test_expand_relative(self) -> None:
+        d = self.dir
+        cwd = os.getcwd()
+        os.chdir(d)
+        self.addCleanup(os.chdir, cwd)
+        self.assertEqual(
+            self.manifests.expand(["a.jar", "./lib/b.jar"]).classpath,
+            ["a.jar", f"{d}/lib/b.jar", f"{d}/lib/sub/c d.jar", f"{d}/classes/"],
+        )
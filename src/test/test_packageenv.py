@@ -0,0 +1,55 @@
+from unittest import TestCase
+import os
+import tempfile
+from javatoolkit.packageenv import PackageResolver, parse_env
+
+
+class PackageResolverTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.dir = tmpdir.name
+        self.write("a/package.env", 'CLASSPATH="/a/a.jar"\nDEPEND="b:c.jar@c"\n')
+        self.write("b/package.env", 'CLASSPATH="/b/b.jar:/a/a.jar"\nDEPEND="c"\n')
+        self.write("c/package.env", 'CLASSPATH="/c/c.jar:/c/d.jar"\nDEPEND="d"\n')
+        self.write("d/classpath.env", 'CLASSPATH="/d/d.jar"\n')
+        self.write("x/package.env", 'CLASSPATH="/x.jar"\nDEPEND="y:missing"\n')
+        self.write("y/package.env", 'CLASSPATH="/y.jar"\nDEPEND="x"\n')
+        self.write("java/packages/z", 'CLASSPATH="/z.jar"\n')
+        self.resolver = PackageResolver(self.dir)
+
+    def write(self, path: str, text: str) -> None:
+        path = f"{self.dir}/{path}"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_parse_env(self) -> None:
+        self.write("env", 'DESCRIPTION="A package"\nSLOT=0\n# comment\n')
+        self.assertEqual(
+            parse_env(f"{self.dir}/env"), {"DESCRIPTION": "A package", "SLOT": "0"}
+        )
+
+    def test_packages(self) -> None:
+        self.assertEqual(
+            sorted(self.resolver.packages()), ["a", "b", "c", "d", "x", "y", "z"]
+        )
+
+    def test_classpath(self) -> None:
+        self.assertEqual(
+            str(self.resolver.classpath("a")),
+            "/a/a.jar:/b/b.jar:/c/c.jar:/c/d.jar:/d/d.jar",
+        )
+        self.assertEqual(str(self.resolver.classpath("a", deps=False)), "/a/a.jar")
+        self.assertEqual(str(self.resolver.classpath("d")), "/d/d.jar")
+        self.assertEqual(str(self.resolver.classpath("z")), "/z.jar")
+        with self.assertRaises(KeyError):
+            self.resolver.classpath("missing")
+
+    def test_cycle(self) -> None:
+        self.assertEqual(str(self.resolver.classpath("x")), "/x.jar:/y.jar")
+        self.assertEqual(str(self.resolver.classpath("y")), "/y.jar:/x.jar")
+
+    def test_copies(self) -> None:
+        self.resolver.classpath("a").append("/other.jar")
+        self.assertNotIn("/other.jar", str(self.resolver.classpath("a")))
@@ -0,0 +1,92 @@
+from unittest import TestCase
+import os
+import sqlite3
+import tempfile
+import javatoolkit.cvv as cvv
+from javatoolkit.scancache import ScanCache
+from .test_cvv import write_jar
+
+
+class ScanCacheTest(TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.db = f"{tmpdir.name}/cache.db"
+        self.jar = f"{tmpdir.name}/a.jar"
+        write_jar(self.jar, [("A.class", 8), ("B.class", 11)])
+
+    def check(self, cache: ScanCache) -> cvv.CVVMagic:
+        m = cvv.CVVMagic("8", cache)
+        m.do(self.jar)
+        self.assertEqual(len(m.good), 1)
+        self.assertEqual(len(m.bad), 1)
+        return m
+
+    def test_hit(self) -> None:
+        with ScanCache(self.db) as cache:
+            self.check(cache)
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+        with ScanCache(self.db) as cache:
+            self.check(cache)
+            self.check(cache)
+            self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+    def test_same_central_directory(self) -> None:
+        with ScanCache(self.db) as cache:
+            self.check(cache)
+        st = os.stat(self.jar)
+        os.utime(self.jar, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        with ScanCache(self.db) as cache:
+            self.check(cache)
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_changed(self) -> None:
+        with ScanCache(self.db) as cache:
+            self.check(cache)
+        write_jar(self.jar, [("A.class", 8), ("B.class", 11), ("C.class", 7)])
+        with ScanCache(self.db) as cache:
+            m = cvv.CVVMagic("8", cache)
+            m.do(self.jar)
+            self.assertEqual(len(m.good), 2)
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_parallel(self) -> None:
+        for hits, misses in (0, 1), (1, 0):
+            with ScanCache(self.db) as cache:
+                m = cvv.CVVMagic("8", cache)
+                m.do_many([self.jar], jobs=2)
+                self.assertEqual(len(m.bad), 1)
+                self.assertEqual((cache.hits, cache.misses), (hits, misses))
+
+    def test_eviction(self) -> None:
+        with ScanCache(self.db, max_size=0) as cache:
+            self.check(cache)
+        with ScanCache(self.db) as cache:
+            self.check(cache)
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_shared(self) -> None:
+        other_jar = f"{os.path.dirname(self.jar)}/b.jar"
+        write_jar(other_jar, [("A.class", 8)])
+        with ScanCache(self.db) as cache:
+            self.check(cache)
+            self.check(cache)
+            # Hits don't keep the database locked for others
+            with ScanCache(self.db, timeout=0.1) as other:
+                cvv.CVVMagic("8", other).do(other_jar)
+        with ScanCache(self.db) as cache:
+            cvv.CVVMagic("8", cache).do(other_jar)
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_locked(self) -> None:
+        db = sqlite3.connect(self.db, isolation_level=None)
+        self.addCleanup(db.close)
+        with ScanCache(self.db, timeout=0.1) as cache:
+            db.execute("BEGIN IMMEDIATE")
+            # Read without storing the scan while another process writes
+            self.check(cache)
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+            db.rollback()
+        with ScanCache(self.db) as cache:
+            self.check(cache)
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
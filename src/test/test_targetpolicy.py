@@ -0,0 +1,69 @@
+from unittest import TestCase
+import os
+import tempfile
+import javatoolkit.cvv as cvv
+from javatoolkit.targetpolicy import TargetPolicy
+from .test_cvv import write_jar
+
+
+class TargetPolicyTest(TestCase):
+    def setUp(self) -> None:
+        self.policy = TargetPolicy(
+            [
+                ("lib/tools.jar!/com/sun", 17),
+                ("lib/tools.jar", 11),
+                ("**/plugins/*.jar", 11),
+                ("/opt/foo/*.class", 9),
+            ]
+        )
+
+    def lookup(self, path: str, *members: str) -> int | None:
+        loc: cvv.Loc = cvv.FileLoc(path)
+        for member in members:
+            loc = cvv.JarLoc(loc, member)
+        return self.policy.lookup(loc)
+
+    def test_files(self) -> None:
+        self.assertEqual(self.lookup("/usr/share/foo/lib/tools.jar"), 11)
+        self.assertEqual(self.lookup("lib/tools.jar"), 11)
+        self.assertIsNone(self.lookup("mylib/tools.jar"))
+        self.assertEqual(self.lookup("a/b/plugins/x.jar"), 11)
+        self.assertIsNone(self.lookup("a/plugins/b/x.jar"))
+        self.assertIsNone(self.lookup("a/plugins/b/c/x.war"))
+        self.assertEqual(self.lookup("/opt/foo/A.class"), 9)
+        self.assertIsNone(self.lookup("/opt/foo/bar/A.class"))
+        self.assertIsNone(self.lookup("/usr/opt/foo/A.class"))
+
+    def test_members(self) -> None:
+        self.assertEqual(self.lookup("lib/tools.jar", "com/sun/A.class"), 17)
+        self.assertEqual(self.lookup("lib/tools.jar", "com/A.class"), 11)
+        self.assertEqual(self.lookup("plugins/x.jar", "a.jar", "A.class"), 11)
+        self.assertTrue(self.policy.has_member_rules)
+
+    def test_load(self) -> None:
+        with tempfile.NamedTemporaryFile("w", suffix=".policy") as f:
+            f.write("# comment\n\n*.jar   1.8\nlib/with space.jar 11\n")
+            f.flush()
+            policy = TargetPolicy.load(f.name)
+            self.assertEqual(policy.rules, [("*.jar", 8), ("lib/with space.jar", 11)])
+            f.write("bad\n")
+            f.flush()
+            with self.assertRaisesRegex(ValueError, ":5:"):
+                TargetPolicy.load(f.name)
+
+    def test_check(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        os.mkdir(f"{tmpdir.name}/lib")
+        files = [("com/sun/A.class", 17), ("com/B.class", 11), ("C.class", 8)]
+        write_jar(f"{tmpdir.name}/lib/tools.jar", files)
+        write_jar(f"{tmpdir.name}/core.jar", files)
+
+        m = cvv.CVVMagic("8", policy=self.policy)
+        m.do_many([f"{tmpdir.name}/lib/tools.jar", f"{tmpdir.name}/core.jar"])
+        self.assertEqual(
+            [(f.loc.member, f.expected_version) for f in m.good],
+            [("com/sun/A.class", "17"), ("com/B.class", "11"), ("C.class", "11")]
+            + [("C.class", "1.8")],
+        )
+        self.assertEqual(m.bad_count, 2)
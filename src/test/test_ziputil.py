@@ -0,0 +1,161 @@
+from unittest import TestCase
+from zipfile import BadZipFile, ZipFile, ZIP_BZIP2, ZIP_DEFLATED, ZIP_STORED
+import io
+import os
+import struct
+import tempfile
+from javatoolkit.ziputil import (
+    FileWindow,
+    ZipDirectory,
+    open_archive,
+    open_member_archive,
+    open_stream_archive,
+    read_member_head,
+)
+
+
+def corrupt_member(path: str, name: str) -> None:
+    """Overwrite the start of the data of the member `name` of the archive
+    at `path` with bytes that don't inflate"""
+    with ZipFile(path) as jar:
+        info = jar.getinfo(name)
+    with open(path, "r+b") as f:
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = struct.unpack("<2H", f.read(4))
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        f.write(b"\xff" * 8)
+
+
+class ReadMemberHeadTest(TestCase):
+    def setUp(self) -> None:
+        self.data = os.urandom(64) + b"\0" * 4096
+        self.file = io.BytesIO()
+        with ZipFile(self.file, "w") as jar:
+            jar.writestr("stored", self.data, ZIP_STORED)
+            jar.writestr("deflated", self.data, ZIP_DEFLATED)
+            jar.writestr("tiny", b"abc", ZIP_DEFLATED)
+            jar.writestr("bzip2", self.data, ZIP_BZIP2)
+        self.jar = ZipFile(self.file, "r")
+        self.addCleanup(self.jar.close)
+
+    def test_stored(self) -> None:
+        info = self.jar.getinfo("stored")
+        self.assertEqual(read_member_head(self.file, info, 8), self.data[:8])
+
+    def test_deflated(self) -> None:
+        info = self.jar.getinfo("deflated")
+        self.assertEqual(read_member_head(self.file, info, 8), self.data[:8])
+        self.assertEqual(read_member_head(self.file, info, 100), self.data[:100])
+
+    def test_short_member(self) -> None:
+        info = self.jar.getinfo("tiny")
+        self.assertEqual(read_member_head(self.file, info, 8), b"abc")
+
+    def test_unsupported_method(self) -> None:
+        info = self.jar.getinfo("bzip2")
+        self.assertIsNone(read_member_head(self.file, info, 8))
+
+    def test_keeps_position(self) -> None:
+        self.file.seek(5)
+        read_member_head(self.file, self.jar.getinfo("deflated"), 8)
+        self.assertEqual(self.file.tell(), 5)
+
+
+class FileWindowTest(TestCase):
+    def test_read_and_seek(self) -> None:
+        with FileWindow(memoryview(b"0123456789")) as f:
+            window = f.window(2, 5)
+            self.assertEqual(window.read(2), b"23")
+            self.assertEqual(window.read(), b"456")
+            self.assertEqual(window.read(), b"")
+            window.seek(-2, io.SEEK_END)
+            self.assertEqual(window.tell(), 3)
+            self.assertEqual(window.read(10), b"56")
+            window.close()
+
+
+class CentralDirectoryTest(TestCase):
+    def setUp(self) -> None:
+        inner = io.BytesIO()
+        with ZipFile(inner, "w") as jar:
+            jar.writestr("A.class", b"class A")
+        self.inner = inner.getvalue()
+        self.data = os.urandom(64) + b"\0" * 4096
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = f"{tmpdir.name}/outer.war"
+        with open(self.path, "wb") as f:
+            # Data in front of the archive must not confuse it
+            f.write(b"#!/bin/sh\n")
+            with ZipFile(f, "w") as outer:
+                outer.writestr("stored.jar", self.inner, ZIP_STORED)
+                outer.writestr("deflated.jar", self.inner, ZIP_DEFLATED)
+                outer.writestr("data", self.data, ZIP_DEFLATED)
+                outer.writestr("bzip2", self.data, ZIP_BZIP2)
+                outer.writestr("caf\u00e9", b"")
+
+    def test_members(self) -> None:
+        with open_archive(self.path) as outer:
+            self.assertEqual(len(outer), 5)
+            self.assertEqual(outer.name(4), "caf\u00e9")
+            self.assertEqual(outer.index("data"), 2)
+            self.assertIsNone(outer.index("missing"))
+            self.assertTrue(outer.endswith(0, (b".war", b".jar")))
+            self.assertFalse(outer.endswith(2, b".jar"))
+            self.assertFalse(outer.endswith(4, b"toolong"))
+
+    def test_read(self) -> None:
+        with open_archive(self.path) as outer:
+            for i in 2, 3:
+                self.assertEqual(outer.read(i), self.data)
+                self.assertEqual(outer.read_head(i, 8), self.data[:8])
+            self.assertEqual(outer.read(0), self.inner)
+
+    def test_digest(self) -> None:
+        with open_archive(self.path) as outer, ZipFile(self.path) as jar:
+            self.assertEqual(outer.digest(), ZipDirectory(jar).digest())
+
+    def test_open_nested(self) -> None:
+        with open_archive(self.path) as outer:
+            for name in "stored.jar", "deflated.jar":
+                with outer.open_nested(outer.index(name)) as inner:
+                    self.assertEqual(inner.read(inner.index("A.class")), b"class A")
+
+    def test_open_nested_spooled(self) -> None:
+        with open_archive(self.path) as outer:
+            outer.spool_size = 0
+            with outer.open_nested(outer.index("deflated.jar")) as inner:
+                self.assertEqual(inner.read(0), b"class A")
+
+    def test_open_member_archive(self) -> None:
+        with ZipFile(self.path) as outer:
+            info = outer.getinfo("deflated.jar")
+            for spool_size in 0, info.file_size:
+                with open_member_archive(outer, info, spool_size) as inner:
+                    self.assertEqual(inner.read("A.class"), b"class A")
+
+    def test_corrupt_member(self) -> None:
+        corrupt_member(self.path, "deflated.jar")
+        for read in (
+            lambda jar, i: jar.read(i),
+            lambda jar, i: jar.read_head(i, 4),
+            lambda jar, i: jar.open_nested(i).__enter__(),
+        ):
+            with self.assertRaises(BadZipFile):
+                with open_archive(self.path) as outer:
+                    outer.spool_size = 0
+                    read(outer, outer.index("deflated.jar"))
+
+    def test_not_a_zip(self) -> None:
+        with open(self.path, "wb") as f:
+            f.write(b"not a zip")
+        with self.assertRaises(BadZipFile):
+            with open_archive(self.path):
+                pass
+
+    def test_open_stream_archive(self) -> None:
+        for spool_size in 0, len(self.inner):
+            stream = io.BytesIO(self.inner + b"trailing")
+            with open_stream_archive(stream, len(self.inner), spool_size) as jar:
+                self.assertEqual(jar.read(0), b"class A")